@@ -1,30 +1,40 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from openai import OpenAI
 import os
+import json
+import uuid
+import atexit
 from datetime import datetime
-import time
 import gspread
 
 from mongodb_operations import mongodb_manager
 import dropbox
-from environment import load_environment, get_google_credentials, get_flask_config
+from environment import load_environment, get_google_credentials, get_flask_config, get_write_behind_config, get_contact_cache_config, get_logo_upload_config, get_session_store_config
+from persistence.write_behind import WriteBehindQueue
 
 # RAG imports
 from chromadb_setup import initialize_chromadb
-from documents_processing_responses.document_processing import load_documents_from_directory, preprocess_documents
-from embeddings.embedding_generation import generate_embeddings
-from db_operations import upsert_documents_into_db
+from ingestion.ingestion import sync_knowledge_base
 
 # Dropbox configuration
-from dropbox_auth import create_dropbox_client
+from dropbox_auth import create_dropbox_client, dropbox_client_manager
+from logo_upload.jobs import LogoUploadJobs
 
 # Packages
-from chatbot.chatbot import generate_sign_nize_response
+from chatbot.chatbot import generate_sign_nize_response, stream_sign_nize_response, QuoteTriggerFilter, QUOTE_FORM_MARKER
 from validations.validations import validate_email
-from session_manager.session_manager import save_session_to_sheets
-from chatbot.chatbot import build_conversation_text
+from session_manager.session_manager import save_session_to_sheets, get_session_row
+from session_manager.session_store import new_session
+from session_manager.session_backends import create_session_store, VersionConflict
+from session_manager.sheets_sync import sheets_sync_engine
+from chatbot.chatbot import build_conversation_text, response_cache
+from embeddings.embedding_cache import get_embedding_cache
+from embeddings.embedding_generation import EMBEDDING_MODEL
 from hubspot.hubspot import create_hubspot_contact, hubspot_patch_conversation
+from hubspot.client import get_hubspot_client
+from hubspot.contact_resolver import ContactIdResolver
+from hubspot.sync import hubspot_sync_worker
 
 # Load environment variables
 openai_key = load_environment()
@@ -35,16 +45,9 @@ client = OpenAI(api_key=openai_key)
 # Initialize ChromaDB
 collection = initialize_chromadb(openai_key)
 
-# Load and preprocess documents
+# Embed and upsert only new or changed knowledge base chunks
 directory_path = "./data"
-documents = load_documents_from_directory(directory_path)
-chunked_documents = preprocess_documents(documents)
-
-# Generate embeddings
-chunked_documents = generate_embeddings(client, chunked_documents)
-
-# Upsert documents into ChromaDB
-upsert_documents_into_db(collection, chunked_documents)
+sync_knowledge_base(client, collection, directory_path)
 
 # Flask application setup
 app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -53,47 +56,58 @@ CORS(app)
 flask_config = get_flask_config()
 app.config['SECRET_KEY'] = flask_config['FLASK_SECRET_KEY']
 
-# In-memory storage for chat sessions
-chat_sessions = {}
-saved_sessions = set()
+def _load_session(session_id):
+    """Rehydrate a session that is no longer (or not yet) in memory from MongoDB"""
+    result = mongodb_manager.get_chat_session(session_id)
+    if not result.get("success"):
+        return None
+    stored = result["session"]
+    session = new_session(stored.get("email", ""))
+    session["messages"] = stored.get("messages", [])
+    if stored.get("hubspot_contact_id"):
+        session["hubspot_contact_id"] = stored["hubspot_contact_id"]
+    return session
+
+def _flush_evicted_session(session_id, session):
+    """Messages are already persisted per turn; save the remaining session fields before dropping it from memory"""
+    if session.get("unsaved_turns"):
+        # Turns that only reached the local-file fallback so far
+        mongodb_manager.append_chat_turns(session_id, session.get("email", ""), session["unsaved_turns"])
+    if session.get("email") or session.get("hubspot_contact_id"):
+        mongodb_manager.save_session_state(session_id, session.get("email", ""), session.get("hubspot_contact_id"))
+
+# Chat session storage: per-process memory by default, or shared between workers (SESSION_BACKEND=sqlite/redis).
+# Idle sessions are evicted and rehydrated on demand.
+session_store = create_session_store(get_session_store_config(), loader=_load_session, on_evict=_flush_evicted_session)
 
 @app.route("/")
 def index():
     """Serve the main chatbot page (index.html)."""
     return render_template("index.html")
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    print(">>> /chat endpoint hit")
-    user_message = request.json.get("message")
-    session_id = request.json.get("session_id", "default")
-    email = request.json.get("email", "")
-    print("Message received:", user_message)
-    print("Email:", email)
-
- 
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = {
-            "messages": [],
-            "context_history": [],
-            "conversation_state": "initial",
-            "customer_info": {},
-            "email": email
-        }
-    else:
-        
+contact_cache_config = get_contact_cache_config()
+contact_resolver = ContactIdResolver(
+    mongodb_manager.find_hubspot_contact_id,
+    create_hubspot_contact,
+    ttl_seconds=contact_cache_config['ttl_seconds'],
+    max_entries=contact_cache_config['max_entries']
+)
+
+def _ensure_chat_session(session_id, email):
+    """Load or create the session and make sure it is linked to a HubSpot contact"""
+    def set_email(session):
         if email:
-            chat_sessions[session_id]["email"] = email
+            session["email"] = email
+        return session.get("email"), session.get("hubspot_contact_id")
     
     try:
-        current_email = chat_sessions[session_id].get("email")
-        has_contact_id = chat_sessions[session_id].get("hubspot_contact_id")
+        current_email, has_contact_id = session_store.update(session_id, set_email, email=email)
         if current_email and not has_contact_id:
-            print(f"🔎 No hubspot_contact_id for session {session_id}. Upserting contact for {current_email}...")
-            upsert_result = create_hubspot_contact(current_email)
+            print(f"🔎 No hubspot_contact_id for session {session_id}. Resolving contact for {current_email}...")
+            upsert_result = contact_resolver.resolve(current_email)
             if upsert_result.get("success") and upsert_result.get("contact_id"):
                 contact_id = upsert_result.get("contact_id")
-                chat_sessions[session_id]["hubspot_contact_id"] = contact_id
+                session_store.update(session_id, lambda session: session.update(hubspot_contact_id=contact_id))
                 try:
                     mongodb_manager.update_hubspot_contact_id(session_id, contact_id)
                     print(f"✅ hubspot_contact_id stored for session {session_id}: {contact_id}")
@@ -103,98 +117,261 @@ def chat():
                 print(f"⚠️  HubSpot upsert failed or no contact_id returned: {upsert_result}")
     except Exception as e:
         print(f"⚠️  Error ensuring HubSpot contact for session: {e}")
-  
-    chat_sessions[session_id]["messages"].append({
-        "role": "user",
-        "content": user_message
-    })
 
+def _persist_chat_turn(session_id, snapshot):
+    """Save a session snapshot to Google Sheets and MongoDB and sync the conversation to HubSpot"""
+    email = snapshot.get("email", "")
+    messages = snapshot["messages"]
+    message_count = len(messages)
+    
+    if email and sheets_sync_engine:
+        # Coalesced into the next batched Sheets flush instead of one API call per turn
+        sheets_sync_engine.mark_dirty(session_id, email, messages)
+    elif email:
+        update_existing = get_session_row(session_id) is not None
+        print(f"📊 Updating Google Sheets for session {session_id}: {message_count} messages, update_existing={update_existing}")
+        if save_session_to_sheets(session_id, email, messages, update_existing):
+            print(f"✅ Session {session_id} saved to Google Sheets")
+    else:
+        print(f"⚠️  No email available for session {session_id}, skipping Google Sheets update")
+    
     try:
-        response = generate_sign_nize_response(client, user_message, chat_sessions[session_id])
-        quote_form_triggered = "[QUOTE_FORM_TRIGGER]" in response
-        if quote_form_triggered:
-            response = response.replace("[QUOTE_FORM_TRIGGER]", "")
-
-        chat_sessions[session_id]["messages"].append({
-            "role": "assistant",
-            "content": response
-        })
-        
-        message_count = len(chat_sessions[session_id]["messages"])
-        
-        if chat_sessions[session_id].get("email"):
-            update_existing = session_id in saved_sessions
-            print(f"📊 Updating Google Sheets for session {session_id}: {message_count} messages, update_existing={update_existing}")
-            success = save_session_to_sheets(session_id, chat_sessions[session_id]["email"], chat_sessions[session_id]["messages"], update_existing)
-            if success and session_id not in saved_sessions:
-                saved_sessions.add(session_id)
-                print(f"✅ Session {session_id} added to saved_sessions")
-            elif success:
-                print(f"✅ Session {session_id} updated in Google Sheets")
+        if "new_messages" in snapshot:
+            # Spooled before turns had ids
+            snapshot["turns"] = [{"turn_id": uuid.uuid4().hex, "messages": snapshot.pop("new_messages")}]
+        if "turns" in snapshot:
+            # Only turns not yet in the database are sent; write size no longer grows with the conversation
+            db_result = mongodb_manager.append_chat_turns(session_id, email, snapshot["turns"])
         else:
-            print(f"⚠️  No email available for session {session_id}, skipping Google Sheets update")
-        
-        try:
-            db_result = mongodb_manager.save_chat_session(
-                session_id, 
-                chat_sessions[session_id].get("email", ""), 
-                chat_sessions[session_id]["messages"]
-            )
-            if db_result["success"]:
-                print(f"✅ Chat session saved to database: {db_result['action']}")
-            else:
-                print(f"⚠️  Failed to save chat session to database: {db_result.get('error', 'Unknown error')}")
-        except Exception as db_error:
-            print(f"❌ Database save error: {db_error}")
-        
-        print(f"Generated response for session {session_id}:", response)
+            db_result = mongodb_manager.save_chat_session(session_id, email, messages)
+        if db_result["success"]:
+            print(f"✅ Chat session saved to database: {db_result['action']}")
+            if "turns" in snapshot and (db_result.get("storage") == "mongodb" or not mongodb_manager.connected):
+                _mark_turns_saved(session_id, {turn["turn_id"] for turn in snapshot["turns"]})
+        else:
+            print(f"⚠️  Failed to save chat session to database: {db_result.get('error', 'Unknown error')}")
+    except Exception as db_error:
+        print(f"❌ Database save error: {db_error}")
+
+    contact_id = snapshot.get("hubspot_contact_id")
+    if contact_id and hubspot_sync_worker:
+        # Pushed with the next batched sync instead of one PATCH per message
+        hubspot_sync_worker.mark_dirty(contact_id, session_id, messages)
+    elif contact_id:
+        patch_result = hubspot_patch_conversation(contact_id, build_conversation_text(messages, session_id))
+        if patch_result.get("success"):
+            mongodb_manager.update_hubspot_last_sync(session_id, datetime.utcnow().isoformat() + "Z")
+        else:
+            print(f"⚠️  HubSpot sync skipped/failed: {patch_result.get('error')}")
+
+def _merge_chat_turns(pending, latest):
+    """Coalesce two queued turns: keep the latest session state and every not-yet-written turn"""
+    merged = dict(latest)
+    turns = {}
+    for snapshot in (pending, latest):
+        for turn in snapshot.get("turns", []):
+            turns.setdefault(turn["turn_id"], turn)
+    merged["turns"] = list(turns.values())
+    return merged
+
+write_behind_config = get_write_behind_config()
+persistence_queue = WriteBehindQueue(
+    _persist_chat_turn,
+    write_behind_config['spool_path'],
+    workers=write_behind_config['workers'],
+    max_pending=write_behind_config['max_pending'],
+    max_attempts=write_behind_config['max_attempts'],
+    merge=_merge_chat_turns,
+    name="chat-persistence"
+) if write_behind_config['enabled'] else None
+if sheets_sync_engine:
+    # Registered first so it runs last: the persistence queue drains into it before the final flush
+    atexit.register(sheets_sync_engine.stop)
+if hubspot_sync_worker:
+    atexit.register(hubspot_sync_worker.stop)
+if persistence_queue:
+    atexit.register(persistence_queue.shutdown, write_behind_config['drain_timeout'])
+
+def _session_snapshot(session):
+    """The part of a session the background writers need"""
+    return {
+        "email": session.get("email", ""),
+        "messages": list(session["messages"]),
+        "hubspot_contact_id": session.get("hubspot_contact_id"),
+        "turns": list(session.get("unsaved_turns", []))
+    }
+
+def _append_message(session_id, role, content, closes_turn=None):
+    """
+    Append a message to the session; returns (snapshot for persistence, message count).
+
+    closes_turn lists the earlier messages of the same request: the turn
+    (those plus this message) is then due for persistence.
+    """
+    message = {"role": role, "content": content}
+    turn = None
+    if closes_turn is not None:
+        turn = {"turn_id": uuid.uuid4().hex, "messages": list(closes_turn) + [message]}
+    def append(session):
+        session["messages"].append(dict(message))
+        if turn:
+            session.setdefault("unsaved_turns", []).append(turn)
+        return _session_snapshot(session), len(session["messages"])
+    try:
+        return session_store.update(session_id, append)
+    except VersionConflict:
+        if turn is None:
+            raise
+        snapshot = _snapshot_without_session(session_id, turn, message)
+        return snapshot, len(snapshot["messages"])
+
+def _close_turn(session_id, messages):
+    """Mark messages already in the session (e.g. a user message whose answer failed) as due for persistence"""
+    turn = {"turn_id": uuid.uuid4().hex, "messages": list(messages)}
+    def close(session):
+        session.setdefault("unsaved_turns", []).append(turn)
+        return _session_snapshot(session)
+    try:
+        return session_store.update(session_id, close)
+    except VersionConflict:
+        return _snapshot_without_session(session_id, turn)
+
+def _snapshot_without_session(session_id, turn, new_message=None):
+    """The session kept changing under us (shared backend contention): still hand the turn to the database"""
+    print(f"⚠️  Session {session_id} is busy - persisting turn {turn['turn_id']} without updating the session")
+    snapshot = _session_snapshot(session_store.get(session_id) or new_session())
+    if new_message:
+        snapshot["messages"].append(dict(new_message))
+    snapshot["turns"] = [turn]
+    return snapshot
+
+def _session_busy_response():
+    return jsonify({"message": "This conversation is busy. Please try again in a moment."}), 409
+
+def _mark_turns_saved(session_id, turn_ids):
+    """Forget turns once they are in the database; the rest are re-sent with the next turn"""
+    if session_id not in session_store:
+        return
+    def drop(session):
+        session["unsaved_turns"] = [turn for turn in session.get("unsaved_turns", []) if turn["turn_id"] not in turn_ids]
+    session_store.update(session_id, drop)
+
+def _queue_chat_turn(session_id, snapshot):
+    """Hand the session's latest state to the background writers; the response doesn't wait for Sheets/Mongo/HubSpot"""
+    if persistence_queue and persistence_queue.submit(session_id, snapshot):
+        return
+    _persist_chat_turn(session_id, snapshot)
 
-        try:
-            contact_id = None
-            if session_id in chat_sessions:
-                contact_id = chat_sessions[session_id].get("hubspot_contact_id")
-            if not contact_id:
-              
-                db_session = mongodb_manager.get_chat_session(session_id)
-                if db_session.get("success"):
-                    contact_id = db_session["session"].get("hubspot_contact_id")
-
-            if contact_id:
-              
-                last_sync_iso = None
-                db_session = mongodb_manager.get_chat_session(session_id)
-                if db_session.get("success"):
-                    last_sync_iso = db_session["session"].get("hubspot_last_sync_at")
-
-                should_sync = True
-                if last_sync_iso:
-                    try:
-                        last_sync_dt = datetime.fromisoformat(last_sync_iso.replace("Z", "+00:00"))
-                     
-                        should_sync = (datetime.utcnow() - last_sync_dt).total_seconds() >= 30
-                    except Exception:
-                        should_sync = True
-
-                if should_sync:
-                    conv_text = build_conversation_text(chat_sessions[session_id]["messages"], session_id)
-                    patch_result = hubspot_patch_conversation(contact_id, conv_text)
-                    if patch_result.get("success"):
-                        mongodb_manager.update_hubspot_last_sync(session_id, datetime.utcnow().isoformat() + "Z")
-                    else:
-                        print(f"⚠️  HubSpot sync skipped/failed: {patch_result.get('error')}")
-        except Exception as sync_err:
-            print(f"⚠️  HubSpot sync error: {sync_err}")
-        return jsonify({
-            "message": response,
-            "session_id": session_id,
-            "message_count": len(chat_sessions[session_id]["messages"]),
-            "quote_form_triggered": quote_form_triggered
-        })
-        
+@app.route("/chat", methods=["POST"])
+def chat():
+    print(">>> /chat endpoint hit")
+    user_message = request.json.get("message")
+    session_id = request.json.get("session_id", "default")
+    email = request.json.get("email", "")
+    print("Message received:", user_message)
+    print("Email:", email)
+
+    _ensure_chat_session(session_id, email)
+  
+    try:
+        _append_message(session_id, "user", user_message)
+    except VersionConflict:
+        # Other requests kept changing this session; nothing has been done yet, so the client can retry
+        return _session_busy_response()
+
+    try:
+        response = generate_sign_nize_response(client, user_message)
     except Exception as e:
         print("Error in generate_sign_nize_response:", str(e))
+        # The question is still part of the conversation record
+        _queue_chat_turn(session_id, _close_turn(session_id, [{"role": "user", "content": user_message}]))
         return jsonify({"message": f"Sorry, I encountered an error. Please try again."}), 500
 
+    quote_form_triggered = QUOTE_FORM_MARKER in response
+    if quote_form_triggered:
+        response = response.replace(QUOTE_FORM_MARKER, "")
+
+    snapshot, message_count = _append_message(
+        session_id, "assistant", response,
+        closes_turn=[{"role": "user", "content": user_message}]
+    )
+    _queue_chat_turn(session_id, snapshot)
+    
+    print(f"Generated response for session {session_id}:", response)
+    return jsonify({
+        "message": response,
+        "session_id": session_id,
+        "message_count": message_count,
+        "quote_form_triggered": quote_form_triggered
+    })
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Streaming variant of /chat: sends answer tokens as Server-Sent Events as the model produces them"""
+    print(">>> /chat/stream endpoint hit")
+    user_message = request.json.get("message")
+    session_id = request.json.get("session_id", "default")
+    email = request.json.get("email", "")
+    print("Message received:", user_message)
+
+    _ensure_chat_session(session_id, email)
+
+    try:
+        _append_message(session_id, "user", user_message)
+    except VersionConflict:
+        return _session_busy_response()
+
+    def generate():
+        marker_filter = QuoteTriggerFilter()
+        parts = []
+        turn_closed = False
+        try:
+            try:
+                for delta in stream_sign_nize_response(client, user_message):
+                    text = marker_filter.feed(delta)
+                    if text:
+                        parts.append(text)
+                        yield _sse_event("token", {"text": text})
+                tail = marker_filter.flush()
+                if tail:
+                    parts.append(tail)
+                    yield _sse_event("token", {"text": tail})
+            except Exception as e:
+                print("Error in stream_sign_nize_response:", str(e))
+                turn_closed = True
+                _queue_chat_turn(session_id, _close_turn(session_id, [{"role": "user", "content": user_message}]))
+                yield _sse_event("error", {"message": "Sorry, I encountered an error. Please try again."})
+                return
+
+            response = "".join(parts)
+            snapshot, message_count = _append_message(
+                session_id, "assistant", response,
+                closes_turn=[{"role": "user", "content": user_message}]
+            )
+            turn_closed = True
+            # Queued before "done": a client that disconnects right after it can't stop persistence
+            _queue_chat_turn(session_id, snapshot)
+            yield _sse_event("done", {
+                "session_id": session_id,
+                "message_count": message_count,
+                "quote_form_triggered": marker_filter.triggered
+            })
+            print(f"Streamed response for session {session_id}:", response)
+        except GeneratorExit:
+            if not turn_closed:
+                # Client went away mid-answer; the question is still part of the conversation record
+                print(f"⚠️  Client disconnected from stream for session {session_id}")
+                _queue_chat_turn(session_id, _close_turn(session_id, [{"role": "user", "content": user_message}]))
+            raise
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.route("/validate-email", methods=["POST"])
 def validate_email_endpoint():
     print(">>> Email validation endpoint hit")
@@ -209,8 +386,8 @@ def validate_email_endpoint():
     
     if is_valid:
         
-        print(f"📧 Valid email detected - creating/updating HubSpot contact: {email}")
-        hubspot_result = create_hubspot_contact(email)
+        print(f"📧 Valid email detected - resolving HubSpot contact: {email}")
+        hubspot_result = contact_resolver.resolve(email)
 
         contact_id = None
         if hubspot_result.get("success"):
@@ -218,10 +395,7 @@ def validate_email_endpoint():
             contact_id = hubspot_result.get("contact_id")
          
             if session_id and contact_id:
-                if session_id not in chat_sessions:
-                    chat_sessions[session_id] = {"messages": [], "context_history": [], "conversation_state": "initial", "customer_info": {}, "email": email}
-                chat_sessions[session_id]["email"] = email
-                chat_sessions[session_id]["hubspot_contact_id"] = contact_id
+                session_store.update(session_id, lambda session: session.update(email=email, hubspot_contact_id=contact_id), email=email)
                 try:
                     mongodb_manager.update_hubspot_contact_id(session_id, contact_id)
                     print(f"✅ Saved hubspot_contact_id to MongoDB for session {session_id}")
@@ -265,10 +439,14 @@ def save_quote():
     try:
         result = mongodb_manager.save_quote_data(session_id, email, form_data)
        
-        if result["success"] and session_id in chat_sessions:
+        session = session_store.get(session_id) if result["success"] else None
+        messages = list(session["messages"]) if session else None
+        if messages is not None and sheets_sync_engine:
+            sheets_sync_engine.mark_dirty(session_id, email, messages)
+        elif messages is not None:
             try:
-                update_existing = session_id in saved_sessions
-                save_session_to_sheets(session_id, email, chat_sessions[session_id]["messages"], update_existing)
+                update_existing = get_session_row(session_id) is not None
+                save_session_to_sheets(session_id, email, messages, update_existing)
                 print(f"✅ Google Sheets updated with latest session data for {session_id}")
             except Exception as sheet_error:
                 print(f"⚠️  Failed to update Google Sheets: {sheet_error}")
@@ -298,6 +476,40 @@ def get_quote(session_id):
     except Exception as e:
         return jsonify({"error": f"Failed to get quote: {str(e)}"}), 500
 
+def _record_uploaded_logo(job):
+    """Called once the logo is in Dropbox and shared (or found in the logo index)"""
+    session_id = job["session_id"]
+    logo_info = {
+        "filename": job["filename"],
+        "dropbox_path": job["dropbox_path"],
+        "dropbox_url": job["dropbox_url"],
+        "size": job["bytes_total"],
+        "upload_time": datetime.now().isoformat()
+    }
+    mongodb_manager.save_logo(session_id, job["content_hash"], logo_info)
+    session_store.update(session_id, lambda session: session.setdefault("logos", []).append(logo_info))
+
+def _handle_upload_error(job, job_error):
+    if isinstance(job_error, dropbox.exceptions.AuthError):
+        # Token revoked or expired early - refresh on the next upload
+        dropbox_client_manager.invalidate()
+
+logo_upload_config = get_logo_upload_config()
+logo_upload_jobs = LogoUploadJobs(
+    create_dropbox_client,
+    spool_dir=logo_upload_config['spool_dir'],
+    workers=logo_upload_config['workers'],
+    block_size=logo_upload_config['block_size'],
+    job_ttl=logo_upload_config['job_ttl'],
+    on_complete=_record_uploaded_logo,
+    on_error=_handle_upload_error,
+    find_duplicate=mongodb_manager.find_logo_by_hash,
+    # Job state is shared so a status poll can land on any worker
+    save_job=lambda job: mongodb_manager.save_logo_job(job, logo_upload_config['job_ttl']),
+    load_job=mongodb_manager.get_logo_job
+)
+atexit.register(logo_upload_jobs.shutdown)
+
 @app.route("/upload-logo", methods=["POST"])
 def upload_logo():
     print(">>> Upload logo endpoint hit")
@@ -321,59 +533,23 @@ def upload_logo():
         if file_extension not in allowed_extensions:
             return jsonify({"success": False, "message": f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}"}), 400
         
-        try:
-            filename = f"logo_{int(time.time())}_{file.filename}"
-            dropbox_path = f"/logos/{session_id}/{filename}"
-            
-            dbx = create_dropbox_client()
-            if not dbx:
-                print("❌ Failed to create Dropbox client")
-                return jsonify({"success": False, "message": "Failed to connect to Dropbox"}), 500
-            
-            file_content = file.read()
-            dbx.files_upload(file_content, dropbox_path, mode=dropbox.files.WriteMode.overwrite)
-            print(f"✅ Uploaded to Dropbox: {dropbox_path}")
-            
-            try:
-                link_metadata = dbx.sharing_create_shared_link_with_settings(dropbox_path)
-            except dropbox.exceptions.ApiError as e:
-                # If link already exists, fetch it
-                if isinstance(e.error, dropbox.sharing.CreateSharedLinkWithSettingsError):
-                    links = dbx.sharing_list_shared_links(dropbox_path).links
-                    if links:
-                        link_metadata = links[0]
-                    else:
-                        raise
-                else:
-                    raise
-            
-            dropbox_url = link_metadata.url.replace("?dl=0", "?dl=1")
-            print(f"✅ Created shared link: {dropbox_url}")
-
-            logo_info = {
-                "filename": filename,
-                "dropbox_url": dropbox_url,
-                "upload_time": datetime.now().isoformat()
-            }
-            
-          
-            if session_id not in chat_sessions:
-                chat_sessions[session_id] = {"logos": []}
-            elif "logos" not in chat_sessions[session_id]:
-                chat_sessions[session_id]["logos"] = []
-            
-            chat_sessions[session_id]["logos"].append(logo_info)
-            
+        # Spooled to disk and uploaded in the background; the client polls the status URL
+        job = logo_upload_jobs.submit(session_id, file, file.filename)
+        if job["deduplicated"]:
             return jsonify({
                 "success": True,
-                "message": f"Logo uploaded successfully: {filename}",
-                "dropbox_url": dropbox_url,
-                "logo_count": len(chat_sessions[session_id]["logos"])
+                "message": f"Logo already uploaded: {job['filename']}",
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "dropbox_url": job["dropbox_url"]
             })
-            
-        except Exception as dropbox_error:
-            print(f"❌ Dropbox upload failed: {dropbox_error}")
-            return jsonify({"success": False, "message": f"Failed to upload to Dropbox: {str(dropbox_error)}"}), 500
+        return jsonify({
+            "success": True,
+            "message": f"Logo upload started: {job['filename']}",
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/upload-logo/{job['job_id']}"
+        }), 202
         
     except Exception as e:
         print(f"❌ Upload logo error: {str(e)}")
@@ -381,31 +557,24 @@ def upload_logo():
         traceback.print_exc()
         return jsonify({"success": False, "message": f"Upload failed: {str(e)}"}), 500
 
+@app.route("/upload-logo/<job_id>", methods=["GET"])
+def upload_logo_status(job_id):
+    job = logo_upload_jobs.get(job_id)
+    if not job:
+        return jsonify({"success": False, "message": "Upload job not found"}), 404
+    return jsonify({"success": job["status"] != "failed", **job})
+
 @app.route("/session/<session_id>/messages", methods=["GET"])
 def get_session_messages(session_id):
     print(f">>> Get session messages endpoint hit for session {session_id}")
     
     try:
+        # Served from memory, or rehydrated from MongoDB if the session isn't loaded
+        session = session_store.get(session_id)
         
-        result = mongodb_manager.get_chat_session(session_id)
-        
-        if result["success"]:
-            session_data = result["session"]
-            messages = session_data.get("messages", [])
-            email = session_data.get("email", "")
-            
-            if session_id not in chat_sessions:
-                chat_sessions[session_id] = {
-                    "messages": messages,
-                    "email": email,
-                    "context_history": [],
-                    "conversation_state": "initial",
-                    "customer_info": {}
-                }
-            else:
-                chat_sessions[session_id]["messages"] = messages
-                chat_sessions[session_id]["email"] = email
-            
+        if session:
+            messages = list(session["messages"])
+            email = session.get("email", "")
             return jsonify({
                 "success": True,
                 "messages": messages,
@@ -413,25 +582,14 @@ def get_session_messages(session_id):
                 "message_count": len(messages)
             })
         else:
-            # Fallback to in-memory session
-            if session_id in chat_sessions and "messages" in chat_sessions[session_id]:
-                messages = chat_sessions[session_id]["messages"]
-                email = chat_sessions[session_id].get("email", "")
-                return jsonify({
-                    "success": True,
-                    "messages": messages,
-                    "email": email,
-                    "message_count": len(messages)
-                })
-            else:
-                # No session found
-                return jsonify({
-                    "success": False,
-                    "messages": [],
-                    "email": "",
-                    "message_count": 0,
-                    "message": "Session not found"
-                })
+            # No session found
+            return jsonify({
+                "success": False,
+                "messages": [],
+                "email": "",
+                "message_count": 0,
+                "message": "Session not found"
+            })
     except Exception as e:
         print(f"❌ Error getting session messages: {str(e)}")
         return jsonify({"error": f"Failed to get session messages: {str(e)}"}), 500
@@ -441,15 +599,33 @@ def get_session_logos(session_id):
     print(f">>> Get logos endpoint hit for session {session_id}")
     
     try:
-        if session_id in chat_sessions and "logos" in chat_sessions[session_id]:
-            logos = chat_sessions[session_id]["logos"]
-            return jsonify({"logos": logos})
-        else:
-          
-            return jsonify({"logos": []})
+        # The persisted logo index survives restarts; the in-memory list doesn't
+        logos = mongodb_manager.get_session_logos(session_id)
+        return jsonify({"logos": logos})
     except Exception as e:
         return jsonify({"error": f"Failed to get logos: {str(e)}"}), 500
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    embedding_cache = get_embedding_cache(EMBEDDING_MODEL)
+    hubspot_client = get_hubspot_client()
+    return jsonify({
+        "response_cache": response_cache.stats() if response_cache else None,
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "persistence_queue": persistence_queue.stats() if persistence_queue else None,
+        "sheets_sync": sheets_sync_engine.stats() if sheets_sync_engine else None,
+        "hubspot": hubspot_client.stats() if hubspot_client else None,
+        "hubspot_contacts": contact_resolver.stats(),
+        "hubspot_sync": hubspot_sync_worker.stats() if hubspot_sync_worker else None,
+        "logo_uploads": logo_upload_jobs.stats(),
+        "sessions": session_store.stats(),
+        "mongodb": {
+            "connected": mongodb_manager.connected,
+            "slow_queries": mongodb_manager.slow_query_logger.slow_queries,
+            "slow_query_ms": mongodb_manager.slow_query_logger.threshold_ms
+        }
+    })
+
 if __name__ == "__main__":
     debug_mode = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
     app.run(host="0.0.0.0", port=5000, debug=debug_mode)
@@ -1,9 +1,12 @@
+import re
 from mongodb_operations import mongodb_manager
 from datetime import datetime
 from prompt.prompt import SIGN_NIZE_SYSTEM_PROMPT
 from documents_processing_responses.query_and_response import query_documents
-from chromadb_setup import initialize_chromadb
-from environment import load_environment
+from chromadb_setup import initialize_chromadb, create_query_embedding_function
+from environment import load_environment, get_response_cache_config
+from ingestion.ingestion import get_knowledge_base_version
+from chatbot.response_cache import SemanticResponseCache
 
 # Load environment variables
 openai_key = load_environment()
@@ -101,19 +104,62 @@ except Exception as e:
     print(f"⚠️  Failed to initialize ChromaDB: {e}")
     chroma_collection = None
 
-def generate_sign_nize_response(client, user_message,
-                                #  session_data
-                                 ): ## removing session data argument
-    """Generate response using the Sign-nize customer support system prompt with context awareness and RAG"""
+query_embedding_function = create_query_embedding_function(openai_key)
+
+response_cache_config = get_response_cache_config()
+response_cache = SemanticResponseCache(
+    similarity_threshold=response_cache_config['similarity_threshold'],
+    ttl_seconds=response_cache_config['ttl_seconds'],
+    max_entries=response_cache_config['max_entries']
+) if response_cache_config['enabled'] else None
+
+# Personal details the bot collects (emails, phone numbers, order ids) must never be served to another session
+_EMAIL_PATTERN = re.compile(r'[\w.%+-]+@[\w.-]+\.[a-zA-Z]{2,}')
+_PHONE_PATTERN = re.compile(r'\+?\d[\d\s().-]{6,}\d')
+_ORDER_PATTERN = re.compile(r'(?:order|invoice|tracking|ticket)\s*(?:id|number|no\.?|#)?\s*[:#]?\s*[A-Za-z]*\d+|#\s*\d{3,}', re.IGNORECASE)
+# Tokens that identify a customer: anything with a digit or an @
+_IDENTIFYING_TOKEN = re.compile(r'\S*[\d@]\S*')
+
+def _contains_personal_data(text):
+    return bool(_EMAIL_PATTERN.search(text) or _PHONE_PATTERN.search(text) or _ORDER_PATTERN.search(text))
+
+def _echoes_user_tokens(user_message, answer):
+    """True if the answer repeats an identifying token (number, email, id) from the question"""
+    tokens = {token.strip('.,;:!?()[]"\'') for token in _IDENTIFYING_TOKEN.findall(user_message)}
+    return any(len(token) >= 3 and token in answer for token in tokens)
+
+def _embed_user_message(user_message):
+    """Embed the message once; the vector serves both the response cache and the RAG query"""
+    try:
+        return query_embedding_function([user_message])[0]
+    except Exception as e:
+        print(f"⚠️  Failed to embed user message: {e}")
+        return None
+
+def _prepare_completion(user_message):
+    """Build the chat messages for a user message, or return a cached answer if one applies"""
 
     current_date = datetime.now().strftime('%B %d, %Y')
     system_prompt = SIGN_NIZE_SYSTEM_PROMPT.replace('{{date}}', current_date)
 
+    message_embedding = _embed_user_message(user_message)
+    # Answers mention dates, so a cached answer is only reused on the same day and knowledge base
+    cache_version = f"{get_knowledge_base_version()}:{current_date}"
+    # Messages carrying customer details differ only in those details, so they'd match each other's answers
+    cacheable = not _contains_personal_data(user_message)
+    if response_cache and cacheable and message_embedding is not None:
+        cached_answer = response_cache.lookup(message_embedding, cache_version)
+        if cached_answer is not None:
+            return {"cached_answer": cached_answer}
+
     knowledge_context = ""
     if chroma_collection:
         try:
             print("🔍 Querying knowledge base for relevant information...")
-            relevant_chunks = query_documents(chroma_collection, [user_message], n_results=3)
+            relevant_chunks = query_documents(
+                chroma_collection, [user_message], n_results=3,
+                query_embeddings=[message_embedding] if message_embedding is not None else None
+            )
             if relevant_chunks and relevant_chunks[0]:
                 knowledge_context = "\n\nKNOWLEDGE BASE CONTEXT:\n" + "\n\n".join(relevant_chunks)
                 print(f"✅ Found {len(relevant_chunks)} relevant knowledge chunks")
@@ -198,9 +244,12 @@ def generate_sign_nize_response(client, user_message,
     full_prompt = system_prompt + f"\n\nCurrent User Message: {user_message}"
     # + email_context + context_instructions + knowledge_context + conversation_context +
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    return {
+        "cached_answer": None,
+        "embedding": message_embedding,
+        "cache_version": cache_version,
+        "cacheable": cacheable,
+        "messages": [
             {
                 "role": "system",
                 "content": full_prompt,
@@ -209,9 +258,85 @@ def generate_sign_nize_response(client, user_message,
                 "role": "user",
                 "content": user_message,
             },
-        ],
+        ]
+    }
+
+def _remember_answer(prepared, user_message, answer):
+    if not (response_cache and prepared["cacheable"] and prepared["embedding"] is not None and answer):
+        return
+    if _echoes_user_tokens(user_message, answer):
+        return
+    response_cache.store(prepared["embedding"], prepared["cache_version"], user_message, answer)
+
+def generate_sign_nize_response(client, user_message,
+                                 session_data=None  # accepted for existing callers, no longer used
+                                 ):
+    """Generate response using the Sign-nize customer support system prompt with context awareness and RAG"""
+    prepared = _prepare_completion(user_message)
+    if prepared["cached_answer"] is not None:
+        return prepared["cached_answer"]
+
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=prepared["messages"],
         max_tokens=1500,
         temperature=0.0
     )
 
-    return response.choices[0].message.content
+    answer = response.choices[0].message.content
+    _remember_answer(prepared, user_message, answer)
+    return answer
+
+def stream_sign_nize_response(client, user_message):
+    """Same as generate_sign_nize_response, but yields the answer in pieces as the model produces them"""
+    prepared = _prepare_completion(user_message)
+    if prepared["cached_answer"] is not None:
+        yield prepared["cached_answer"]
+        return
+
+    stream = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=prepared["messages"],
+        max_tokens=1500,
+        temperature=0.0,
+        stream=True
+    )
+
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    _remember_answer(prepared, user_message, "".join(parts))
+
+QUOTE_FORM_MARKER = "[QUOTE_FORM_TRIGGER]"
+
+class QuoteTriggerFilter:
+    """Strips the quote form marker from a token stream, even when it arrives split across tokens"""
+
+    def __init__(self, marker=QUOTE_FORM_MARKER):
+        self.marker = marker
+        self.triggered = False
+        self._pending = ""
+
+    def feed(self, text):
+        """Return the part of the stream that is safe to emit now"""
+        self._pending += text
+        if self.marker in self._pending:
+            self.triggered = True
+            self._pending = self._pending.replace(self.marker, "")
+        # Hold back a tail that could still turn into the marker
+        for keep in range(min(len(self.marker) - 1, len(self._pending)), 0, -1):
+            if self.marker.startswith(self._pending[-keep:]):
+                ready, self._pending = self._pending[:-keep], self._pending[-keep:]
+                return ready
+        ready, self._pending = self._pending, ""
+        return ready
+
+    def flush(self):
+        ready, self._pending = self._pending, ""
+        return ready
@@ -0,0 +1,99 @@
+import time
+import threading
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    A lookup returns a stored answer when a previous question's embedding has
+    cosine similarity >= similarity_threshold with the incoming one and both
+    were answered against the same knowledge base version. Entries expire
+    after ttl_seconds; beyond max_entries the oldest entries are dropped.
+    """
+
+    def __init__(self, similarity_threshold=0.95, ttl_seconds=3600, max_entries=1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._vectors = None  # (n, dim) matrix of unit-normalized question embeddings
+        self._entries = []  # parallel list of {"question", "answer", "created_at"}
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _sync_version(self, version):
+        """Drop everything cached against an older knowledge base"""
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+                print(f"🧹 Response cache version changed ({self.version} -> {version}) - clearing cached answers")
+            self._vectors = None
+            self._entries = []
+            self.version = version
+
+    def _expire(self, now):
+        if not self._entries:
+            return
+        keep = [i for i, entry in enumerate(self._entries) if now - entry["created_at"] < self.ttl_seconds]
+        if len(keep) != len(self._entries):
+            self.evictions += len(self._entries) - len(keep)
+            self._entries = [self._entries[i] for i in keep]
+            self._vectors = self._vectors[keep] if keep else None
+
+    def lookup(self, embedding, version):
+        with self._lock:
+            self._sync_version(version)
+            self._expire(time.time())
+            if self._vectors is None:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                self.hits += 1
+                entry = self._entries[best]
+                print(f"⚡ Response cache hit (similarity {similarities[best]:.3f}): {entry['question'][:60]}")
+                return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, version, question, answer):
+        with self._lock:
+            self._sync_version(version)
+            vector = self._normalize(embedding)[np.newaxis, :]
+            self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+            self._entries.append({"question": question, "answer": answer, "created_at": time.time()})
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self.evictions += overflow
+                self._entries = self._entries[overflow:]
+                self._vectors = self._vectors[overflow:]
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "kb_version": self.version
+        }
@@ -1,12 +1,18 @@
 import chromadb
 from chromadb.utils import embedding_functions
+from embeddings.embedding_generation import EMBEDDING_MODEL
+from embeddings.embedding_cache import CachedEmbeddingFunction
 
-def initialize_chromadb(openai_key, path="chroma_persistent_storage", collection_name="document_qa_collection"):
+def create_query_embedding_function(openai_key):
     openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-        api_key=openai_key, model_name="text-embedding-3-small"
+        api_key=openai_key, model_name=EMBEDDING_MODEL
     )
+    # Query texts go through the same on-disk cache as ingestion, so repeated questions skip the API
+    return CachedEmbeddingFunction(openai_ef, EMBEDDING_MODEL)
+
+def initialize_chromadb(openai_key, path="chroma_persistent_storage", collection_name="document_qa_collection"):
     chroma_client = chromadb.PersistentClient(path=path)
     collection = chroma_client.get_or_create_collection(
-        name=collection_name, embedding_function=openai_ef
+        name=collection_name, embedding_function=create_query_embedding_function(openai_key)
     )
     return collection
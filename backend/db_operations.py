@@ -1,6 +1,42 @@
-def upsert_documents_into_db(collection, chunked_documents):
-    for doc in chunked_documents:
-        print("==== Inserting chunks into db;;; ====")
+import time
+
+DEFAULT_UPSERT_BATCH_SIZE = 256
+
+def _chunk_metadata(doc):
+    metadata = {}
+    if doc.get("source_file") is not None:
+        metadata["source_file"] = doc["source_file"]
+    if doc.get("chunk_index") is not None:
+        metadata["chunk_index"] = doc["chunk_index"]
+    return metadata
+
+def bulk_upsert_documents(collection, chunked_documents, batch_size=DEFAULT_UPSERT_BATCH_SIZE):
+    """Upsert chunks in sized batches, keeping source_file/chunk_index as metadata. Returns per-batch timings."""
+    # Chroma caps the number of records per call; never exceed what the client allows
+    try:
+        batch_size = min(batch_size, collection._client.get_max_batch_size())
+    except Exception:
+        pass
+
+    timings = []
+    for start in range(0, len(chunked_documents), batch_size):
+        batch = chunked_documents[start:start + batch_size]
+        metadatas = [_chunk_metadata(doc) for doc in batch]
+        started = time.time()
         collection.upsert(
-            ids=[doc["id"]], documents=[doc["text"]], embeddings=[doc["embedding"]]
+            ids=[doc["id"] for doc in batch],
+            documents=[doc["text"] for doc in batch],
+            embeddings=[doc["embedding"] for doc in batch],
+            # Chroma rejects empty metadata dicts, so only send them when every chunk has some
+            metadatas=metadatas if all(metadatas) else None
         )
+        elapsed = time.time() - started
+        timings.append({"batch": len(timings) + 1, "size": len(batch), "seconds": round(elapsed, 4)})
+        print(f"==== Upserted batch {len(timings)} ({len(batch)} chunks) in {elapsed:.3f}s ====")
+
+    total = sum(t["seconds"] for t in timings)
+    print(f"✅ Upserted {len(chunked_documents)} chunks in {len(timings)} batch(es), {total:.3f}s total")
+    return timings
+
+def upsert_documents_into_db(collection, chunked_documents):
+    return bulk_upsert_documents(collection, chunked_documents)
@@ -95,7 +95,8 @@ def preprocess_documents(documents, chunk_size=1000, chunk_overlap=20):
             chunked_documents.append({
                 "id": f"{doc['id']}_chunk{i+1}", 
                 "text": chunk,
-                "source_file": doc['id']
+                "source_file": doc['id'],
+                "chunk_index": i + 1
             })
         total_chunks += len(chunks)
     
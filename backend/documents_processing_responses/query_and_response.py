@@ -1,7 +1,11 @@
-def query_documents(collection, questions, n_results=2):
+def query_documents(collection, questions, n_results=2, query_embeddings=None):
     print("Querying Chroma...")
     try:
-        results = collection.query(query_texts=questions, n_results=n_results)
+        if query_embeddings is not None:
+            # Caller already embedded the questions; don't pay for it twice
+            results = collection.query(query_embeddings=query_embeddings, n_results=n_results)
+        else:
+            results = collection.query(query_texts=questions, n_results=n_results)
         relevant_chunk = [doc for sublist in results["documents"] for doc in sublist]
         print("Returned relevant chunks")
         return relevant_chunk
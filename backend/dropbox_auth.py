@@ -1,5 +1,6 @@
 import os
 import json
+import threading
 import requests
 from datetime import datetime, timedelta
 from environment import get_dropbox_config
@@ -39,14 +40,14 @@ class DropboxAuth:
                 'client_secret': self.config['app_secret']
             }
             
-            response = requests.post(url, data=data)
+            response = requests.post(url, data=data, timeout=20)
             response.raise_for_status()
             
             token_data = response.json()
             self.access_token = token_data['access_token']
             
-            # Set expiration time (tokens typically last 4 hours)
-            self.token_expires_at = datetime.now() + timedelta(hours=4)
+            # Use the lifetime Dropbox reports; tokens typically last 4 hours
+            self.token_expires_at = datetime.now() + timedelta(seconds=token_data.get('expires_in', 4 * 3600))
             
             print("✅ Dropbox access token refreshed successfully")
             
@@ -81,21 +82,67 @@ class DropboxAuth:
         """Check if we have valid authentication"""
         return self.get_access_token() is not None
 
+class DropboxClientManager:
+    """
+    Process-wide Dropbox client.
+
+    The client is built once and reused; its access token is refreshed under
+    a lock only when it is within refresh_margin of token_expires_at, so
+    concurrent uploads never trigger more than one token request. There is no
+    account probe on the request path - auth problems surface on the upload.
+    """
+
+    def __init__(self, refresh_margin=timedelta(minutes=5)):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._auth = None
+        self._client = None
+        self._client_token = None
+
+    def _token_is_fresh(self):
+        auth = self._auth
+        if not auth.refresh_token:
+            # Access-token-only setups can't refresh; use the token as long as it works
+            return auth.access_token is not None
+        return (auth.access_token is not None and auth.token_expires_at is not None
+                and datetime.now() + self.refresh_margin < auth.token_expires_at)
+
+    def get_client(self):
+        """Return a Dropbox client with a valid token, or None if Dropbox isn't configured"""
+        import dropbox
+
+        # Fast path: no lock while the cached token is still valid
+        if self._client is not None and self._token_is_fresh():
+            return self._client
+
+        with self._lock:
+            if self._auth is None:
+                self._auth = DropboxAuth()
+            token = self._auth.get_access_token()
+            if not token:
+                print("❌ Dropbox authentication failed")
+                return None
+            if token != self._client_token:
+                self._client = dropbox.Dropbox(token)
+                self._client_token = token
+            return self._client
+
+    def invalidate(self):
+        """Force a token refresh on next use (e.g. after an AuthError)"""
+        with self._lock:
+            if self._auth:
+                self._auth.token_expires_at = None
+            self._client = None
+            self._client_token = None
+
+
+dropbox_client_manager = DropboxClientManager()
+
+
 def create_dropbox_client():
-    """Create and return a Dropbox client with proper authentication"""
-    import dropbox
-    
-    auth = DropboxAuth()
-    if not auth.is_authenticated():
-        print("❌ Dropbox authentication failed")
-        return None
-    
+    """Return the shared, authenticated Dropbox client (None if authentication failed)"""
     try:
-        dbx = dropbox.Dropbox(auth.get_access_token())
-        # Test the connection
-        account = dbx.users_get_current_account()
-        print(f"✅ Connected to Dropbox as: {account.name.display_name}")
-        return dbx
+        return dropbox_client_manager.get_client()
     except Exception as e:
         print(f"❌ Dropbox connection failed: {e}")
         return None
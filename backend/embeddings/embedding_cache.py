@@ -0,0 +1,339 @@
+import os
+import time
+import mmap
+import struct
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from chromadb.api.types import EmbeddingFunction
+from environment import get_embedding_cache_config
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: cross-process locking is skipped
+    fcntl = None
+
+# File layout: fixed 64-byte header followed by fixed-size slots of
+#   [32-byte sha256 key][uint64 last-used tick][dim x float32 vector]
+# Fixed slots keep the file memory-mappable and make eviction an in-place overwrite.
+_MAGIC = b"EMBC"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIIQ")  # magic, version, dim, slot_count, tick
+_HEADER_SIZE = 64
+_KEY_SIZE = 32
+_TICK = struct.Struct("<Q")
+_MIN_GROW_SLOTS = 64
+_EMPTY_KEY = bytes(_KEY_SIZE)
+
+
+def normalize_text(text):
+    """Normalize text so trivially different spellings of the same input share a cache entry"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).casefold()
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Content-addressed, size-bounded LRU cache of embedding vectors for one model, backed by an mmap'd file"""
+
+    def __init__(self, path, max_entries=20000):
+        self.path = path
+        self.max_entries = max_entries
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self._slot_count = 0
+        self._tick = 0
+        self._index = OrderedDict()  # key -> slot, least recently used first
+        self._free_slots = []
+        try:
+            self._ensure_open()
+        except Exception as e:
+            print(f"⚠️  Embedding cache {path} unreadable ({e}) - starting empty")
+            self._close()
+            self._quarantine()
+
+    # ---- file management -------------------------------------------------
+
+    def _quarantine(self):
+        """Move an unreadable cache file aside; other workers may still have it mapped, so never delete it in place"""
+        aside = f"{self.path}.corrupt-{os.getpid()}-{int(time.time())}"
+        try:
+            os.replace(self.path, aside)
+            print(f"   Moved unreadable cache file to {aside}")
+        except OSError as e:
+            # Another worker may have moved or replaced it already; running without the old file is fine
+            print(f"⚠️  Could not move aside embedding cache {self.path}: {e}")
+
+    @property
+    def _record_size(self):
+        return _KEY_SIZE + _TICK.size + self.dim * 4
+
+    def _ensure_open(self):
+        """Map the cache file if it exists (possibly created by another worker since we started)"""
+        if self._mmap is not None or not os.path.exists(self.path) or os.path.getsize(self.path) < _HEADER_SIZE:
+            return
+        self._file = open(self.path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, version, dim, slot_count, tick = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION or dim == 0:
+            raise ValueError("bad header")
+        self.dim = dim
+        self._tick = tick
+        self._load_slots(0, slot_count)
+
+    def _load_slots(self, first_slot, slot_count):
+        """Index slots [first_slot, slot_count), keeping the most recently used copy of any key"""
+        entries = []
+        for slot in range(first_slot, slot_count):
+            offset = self._slot_offset(slot)
+            if offset + self._record_size > len(self._mmap):
+                break
+            key = bytes(self._mmap[offset:offset + _KEY_SIZE])
+            (tick,) = _TICK.unpack_from(self._mmap, offset + _KEY_SIZE)
+            self._slot_count = slot + 1
+            if key == _EMPTY_KEY:
+                # Slot being rewritten by another worker
+                self._free_slots.append(slot)
+                continue
+            entries.append((tick, key, slot))
+        for tick, key, slot in sorted(entries):
+            if key in self._index:
+                self._free_slots.append(self._index.pop(key))
+            self._index[key] = slot
+        while len(self._index) > self.max_entries:
+            _, slot = self._index.popitem(last=False)
+            self._free_slots.append(slot)
+
+    def _create(self, dim):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT), "r+b")
+        with self._file_lock():
+            created_elsewhere = os.fstat(self._file.fileno()).st_size >= _HEADER_SIZE
+            if not created_elsewhere:
+                self.dim = dim
+                self._file.truncate(_HEADER_SIZE + self._record_size * min(self.max_entries, _MIN_GROW_SLOTS))
+                self._mmap = mmap.mmap(self._file.fileno(), 0)
+                self._write_header()
+        if created_elsewhere:
+            # Lost the race with another worker; use the file it created
+            self._file.close()
+            self._file = None
+            self._ensure_open()
+
+    def _grow(self):
+        allocated = (len(self._mmap) - _HEADER_SIZE) // self._record_size
+        wanted = _HEADER_SIZE + self._record_size * min(self.max_entries, max(_MIN_GROW_SLOTS, allocated * 2))
+        self._mmap.close()
+        # Never shrink a file another worker has already grown
+        self._file.truncate(max(wanted, os.fstat(self._file.fileno()).st_size))
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+    def _close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def _write_header(self):
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, _FORMAT_VERSION, self.dim, self._slot_count, self._tick)
+
+    def _slot_offset(self, slot):
+        return _HEADER_SIZE + slot * self._record_size
+
+    def _file_lock(self):
+        return _FileLock(self._file)
+
+    # ---- public API ------------------------------------------------------
+
+    def get(self, key):
+        with self._lock:
+            self._ensure_open()
+            if self._mmap is None:
+                self.misses += 1
+                return None
+            slot = self._index.get(key)
+            if slot is None:
+                self._pick_up_foreign_writes()
+                slot = self._index.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            offset = self._slot_offset(slot)
+            # Another worker may have evicted and reused this slot; trust only a matching key
+            if bytes(self._mmap[offset:offset + _KEY_SIZE]) != key:
+                self._forget_reused_slot(key, slot)
+                self.misses += 1
+                return None
+            vector = array("f")
+            vector.frombytes(self._mmap[offset + _KEY_SIZE + _TICK.size:offset + self._record_size])
+            # Read without the file lock: if a writer took the slot meanwhile, the copy may be torn
+            if bytes(self._mmap[offset:offset + _KEY_SIZE]) != key:
+                self._forget_reused_slot(key, slot)
+                self.misses += 1
+                return None
+            self._tick += 1
+            _TICK.pack_into(self._mmap, offset + _KEY_SIZE, self._tick)
+            self._index.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def _forget_reused_slot(self, key, slot):
+        """Drop our stale entry for a slot another worker reused, keeping the slot itself usable"""
+        del self._index[key]
+        offset = self._slot_offset(slot)
+        current = bytes(self._mmap[offset:offset + _KEY_SIZE])
+        if current != _EMPTY_KEY and current not in self._index:
+            # Index what the other worker stored there, as least recently used
+            self._index[current] = slot
+            self._index.move_to_end(current, last=False)
+        else:
+            self._free_slots.append(slot)
+
+    def put(self, key, vector):
+        with self._lock:
+            self._ensure_open()
+            if self._mmap is None:
+                self._create(len(vector))
+            if len(vector) != self.dim:
+                return
+            with self._file_lock():
+                self._pick_up_foreign_writes()
+                slot = self._index.get(key)
+                if slot is None:
+                    slot = self._allocate_slot()
+                self._tick += 1
+                offset = self._slot_offset(slot)
+                # Key last, so a lock-free get() never pairs a key with a half-written vector
+                self._mmap[offset:offset + _KEY_SIZE] = _EMPTY_KEY
+                _TICK.pack_into(self._mmap, offset + _KEY_SIZE, self._tick)
+                self._mmap[offset + _KEY_SIZE + _TICK.size:offset + self._record_size] = array("f", vector).tobytes()
+                self._mmap[offset:offset + _KEY_SIZE] = key
+                self._index[key] = slot
+                self._index.move_to_end(key)
+                self._write_header()
+
+    def _allocate_slot(self):
+        if self._free_slots:
+            return self._free_slots.pop()
+        # The file never grows past max_entries slots, even if some of them aren't indexed here
+        if self._index and (len(self._index) >= self.max_entries or self._slot_count >= self.max_entries):
+            _, slot = self._index.popitem(last=False)
+            self.evictions += 1
+            return slot
+        slot = self._slot_count
+        if self._slot_offset(slot) + self._record_size > len(self._mmap):
+            self._grow()
+        self._slot_count += 1
+        return slot
+
+    def _pick_up_foreign_writes(self):
+        """Index slots appended by other processes sharing the file"""
+        if self._mmap is None:
+            return
+        _, _, _, slot_count, tick = _HEADER.unpack_from(self._mmap, 0)
+        self._tick = max(self._tick, tick)
+        if slot_count > self._slot_count:
+            if self._slot_offset(slot_count) > len(self._mmap):
+                self._mmap.close()
+                self._mmap = mmap.mmap(self._file.fileno(), 0)
+            self._load_slots(self._slot_count, slot_count)
+
+    def flush(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class _FileLock:
+    """Exclusive advisory lock so several workers can append to one cache file"""
+
+    def __init__(self, file):
+        self.file = file
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+embedding_cache_config = get_embedding_cache_config()
+
+
+def get_embedding_cache(model):
+    """Process-wide cache instance for a model, or None when caching is disabled"""
+    config = embedding_cache_config
+    if not config['enabled']:
+        return None
+    with _caches_lock:
+        if model not in _caches:
+            path = os.path.join(config['directory'], f"{model}.bin")
+            _caches[model] = EmbeddingCache(path, max_entries=config['max_entries'])
+        return _caches[model]
+
+
+def embed_with_cache(texts, model, embed_missing):
+    """
+    Return embeddings for texts, calling embed_missing(list_of_texts) only for
+    texts not already cached. Duplicate texts within one call are embedded once.
+    """
+    cache = get_embedding_cache(model)
+    if cache is None:
+        return [list(map(float, v)) for v in embed_missing(list(texts))]
+
+    keys = [cache_key(model, text) for text in texts]
+    results = [cache.get(key) for key in keys]
+
+    missing = OrderedDict()
+    for i, vector in enumerate(results):
+        if vector is None:
+            missing.setdefault(keys[i], []).append(i)
+
+    if missing:
+        fresh = embed_missing([texts[positions[0]] for positions in missing.values()])
+        for (key, positions), vector in zip(missing.items(), fresh):
+            vector = list(map(float, vector))
+            cache.put(key, vector)
+            for i in positions:
+                results[i] = vector
+    return results
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function that serves repeated texts from the shared on-disk cache"""
+
+    def __init__(self, inner, model):
+        self.inner = inner
+        self.model = model
+
+    def __call__(self, input):
+        return embed_with_cache(list(input), self.model, self.inner)
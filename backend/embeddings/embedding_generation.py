@@ -1,11 +1,91 @@
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from environment import get_embedding_config
+from embeddings.embedding_cache import embed_with_cache
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Rough chars-per-token ratio for English text; keeps us clear of the API token cap
+# without pulling in a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
 def get_openai_embedding(client, text):
-    response = client.embeddings.create(input=text, model="text-embedding-3-small")
+    response = client.embeddings.create(input=text, model=EMBEDDING_MODEL)
     embedding = response.data[0].embedding
     print("==== Generating embeddings... ====")
     return embedding
 
-def generate_embeddings(client, chunked_documents):
-    for doc in chunked_documents:
-        print("==== Generating embeddings... ====")
-        doc["embedding"] = get_openai_embedding(client, doc["text"])
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN + 1)
+
+def build_embedding_batches(texts, max_batch_tokens, max_batch_items):
+    """Group text indices into batches that stay under the token and item budgets"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _embed_batch(client, texts, max_retries):
+    """Embed one batch, retrying just this batch with exponential backoff on failure"""
+    attempt = 0
+    while True:
+        try:
+            response = client.embeddings.create(input=texts, model=EMBEDDING_MODEL)
+            # The API returns one item per input, tagged with its position in the request
+            ordered = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in ordered]
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            delay = (2 ** (attempt - 1)) + random.uniform(0, 0.5)
+            print(f"⚠️  Embedding batch of {len(texts)} failed ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+def embed_texts(client, texts, **batch_options):
+    """Embed a list of texts, serving repeats from the shared embedding cache, preserving input order"""
+    if not texts:
+        return []
+    return embed_with_cache(texts, EMBEDDING_MODEL, lambda missing: _embed_batched(client, missing, **batch_options))
+
+def _embed_batched(client, texts, max_batch_tokens=None, max_batch_items=None, max_parallel_batches=None, max_retries=None):
+    """Embed a list of texts with as few requests as possible, preserving input order"""
+    config = get_embedding_config()
+    max_batch_tokens = max_batch_tokens or config['max_batch_tokens']
+    max_batch_items = max_batch_items or config['max_batch_items']
+    max_parallel_batches = max_parallel_batches or config['max_parallel_batches']
+    max_retries = config['max_retries'] if max_retries is None else max_retries
+
+    batches = build_embedding_batches(texts, max_batch_tokens, max_batch_items)
+    print(f"==== Generating embeddings for {len(texts)} chunks in {len(batches)} batch(es) ====")
+
+    embeddings = [None] * len(texts)
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel_batches, len(batches)))) as executor:
+        futures = [
+            (batch, executor.submit(_embed_batch, client, [texts[i] for i in batch], max_retries))
+            for batch in batches
+        ]
+        for batch, future in futures:
+            for index, embedding in zip(batch, future.result()):
+                embeddings[index] = embedding
+
+    print(f"✅ Generated {len(texts)} embeddings in {time.time() - started:.2f}s")
+    return embeddings
+
+def generate_embeddings(client, chunked_documents, **batch_options):
+    vectors = embed_texts(client, [doc["text"] for doc in chunked_documents], **batch_options)
+    for doc, embedding in zip(chunked_documents, vectors):
+        doc["embedding"] = embedding
     return chunked_documents
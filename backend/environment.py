@@ -92,3 +92,138 @@ def get_hubspot_config():
     return {
         'token': hubspot_token
     }
+
+def get_embedding_config():
+    """Get batching limits for OpenAI embedding requests"""
+    load_dotenv()
+    return {
+        'max_batch_tokens': int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '200000')),
+        'max_batch_items': int(os.getenv('EMBEDDING_BATCH_MAX_ITEMS', '512')),
+        'max_parallel_batches': int(os.getenv('EMBEDDING_MAX_PARALLEL_BATCHES', '4')),
+        'max_retries': int(os.getenv('EMBEDDING_MAX_RETRIES', '3'))
+    }
+
+def get_embedding_cache_config():
+    """Get on-disk embedding cache settings"""
+    load_dotenv()
+    return {
+        'enabled': os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true',
+        'directory': os.getenv('EMBEDDING_CACHE_DIR', 'embedding_cache'),
+        'max_entries': int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '20000'))
+    }
+
+def get_response_cache_config():
+    """Get semantic response cache settings"""
+    load_dotenv()
+    return {
+        'enabled': os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true',
+        'similarity_threshold': float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.95')),
+        'ttl_seconds': int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600')),
+        'max_entries': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+    }
+
+def get_speech_config():
+    """Get text-to-speech pipeline settings"""
+    load_dotenv()
+    return {
+        'pipelined': os.getenv('SPEECH_PIPELINED', 'true').lower() == 'true',
+        'max_tts_in_flight': int(os.getenv('SPEECH_MAX_TTS_IN_FLIGHT', '3')),
+        'min_sentence_chars': int(os.getenv('SPEECH_MIN_SENTENCE_CHARS', '20')),
+        'tts_model': os.getenv('SPEECH_TTS_MODEL', 'gpt-4o-mini-tts'),
+        'voice': os.getenv('SPEECH_VOICE', 'alloy')
+    }
+
+def get_vad_config():
+    """Get voice activity detection settings for streamed microphone audio"""
+    load_dotenv()
+    return {
+        'sample_rate': int(os.getenv('VAD_SAMPLE_RATE', '16000')),
+        'frame_ms': int(os.getenv('VAD_FRAME_MS', '30')),
+        'min_rms': float(os.getenv('VAD_MIN_RMS', '300')),
+        'snr_ratio': float(os.getenv('VAD_SNR_RATIO', '2.5')),
+        'max_zcr': float(os.getenv('VAD_MAX_ZCR', '0.35')),
+        'start_frames': int(os.getenv('VAD_START_FRAMES', '3')),
+        'hangover_ms': int(os.getenv('VAD_HANGOVER_MS', '700')),
+        'pre_roll_ms': int(os.getenv('VAD_PRE_ROLL_MS', '300')),
+        'min_speech_ms': int(os.getenv('VAD_MIN_SPEECH_MS', '250')),
+        'max_utterance_ms': int(os.getenv('VAD_MAX_UTTERANCE_MS', '15000'))
+    }
+
+def get_write_behind_config():
+    """Get background persistence queue settings"""
+    load_dotenv()
+    return {
+        'enabled': os.getenv('WRITE_BEHIND_ENABLED', 'true').lower() == 'true',
+        'spool_path': os.getenv('WRITE_BEHIND_SPOOL_PATH', 'write_behind_queue.sqlite3'),
+        'workers': int(os.getenv('WRITE_BEHIND_WORKERS', '2')),
+        'max_pending': int(os.getenv('WRITE_BEHIND_MAX_PENDING', '1000')),
+        'max_attempts': int(os.getenv('WRITE_BEHIND_MAX_ATTEMPTS', '3')),
+        'drain_timeout': float(os.getenv('WRITE_BEHIND_DRAIN_TIMEOUT', '10'))
+    }
+
+def get_sheets_sync_config():
+    """Get Google Sheets batch flush settings"""
+    load_dotenv()
+    return {
+        'enabled': os.getenv('SHEETS_BATCH_SYNC_ENABLED', 'true').lower() == 'true',
+        'flush_interval': float(os.getenv('SHEETS_FLUSH_INTERVAL_SECONDS', '5')),
+        'max_backoff': float(os.getenv('SHEETS_MAX_BACKOFF_SECONDS', '300'))
+    }
+
+def get_mongodb_config():
+    """Get MongoDB index bootstrap and slow-query logging settings"""
+    load_dotenv()
+    return {
+        'ensure_indexes': os.getenv('MONGODB_ENSURE_INDEXES', 'true').lower() == 'true',
+        'slow_query_ms': float(os.getenv('MONGODB_SLOW_QUERY_MS', '100'))
+    }
+
+def get_hubspot_client_config():
+    """Get HubSpot HTTP client settings (timeouts, retries, rate limit)"""
+    load_dotenv()
+    return {
+        'timeout': float(os.getenv('HUBSPOT_TIMEOUT_SECONDS', '20')),
+        'max_retries': int(os.getenv('HUBSPOT_MAX_RETRIES', '4')),
+        'requests_per_10s': int(os.getenv('HUBSPOT_REQUESTS_PER_10S', '100')),
+        'pool_size': int(os.getenv('HUBSPOT_POOL_SIZE', '10'))
+    }
+
+def get_contact_cache_config():
+    """Get email -> HubSpot contact id cache settings"""
+    load_dotenv()
+    return {
+        'ttl_seconds': float(os.getenv('HUBSPOT_CONTACT_CACHE_TTL_SECONDS', '3600')),
+        'max_entries': int(os.getenv('HUBSPOT_CONTACT_CACHE_MAX_ENTRIES', '10000'))
+    }
+
+def get_hubspot_sync_config():
+    """Get batched HubSpot conversation sync settings"""
+    load_dotenv()
+    return {
+        'enabled': os.getenv('HUBSPOT_SYNC_ENABLED', 'true').lower() == 'true',
+        'flush_interval': float(os.getenv('HUBSPOT_SYNC_INTERVAL_SECONDS', '30')),
+        'batch_size': int(os.getenv('HUBSPOT_SYNC_BATCH_SIZE', '100')),
+        'max_backoff': float(os.getenv('HUBSPOT_SYNC_MAX_BACKOFF_SECONDS', '300'))
+    }
+
+def get_logo_upload_config():
+    """Get logo upload settings"""
+    load_dotenv()
+    return {
+        'block_size': int(float(os.getenv('LOGO_UPLOAD_BLOCK_SIZE_MB', '8')) * 1024 * 1024),
+        'spool_dir': os.getenv('LOGO_UPLOAD_SPOOL_DIR', 'logo_upload_spool'),
+        'workers': int(os.getenv('LOGO_UPLOAD_WORKERS', '2')),
+        'job_ttl': float(os.getenv('LOGO_UPLOAD_JOB_TTL_SECONDS', '3600'))
+    }
+
+def get_session_store_config():
+    """Get chat session store settings (backend, limits)"""
+    load_dotenv()
+    return {
+        'backend': os.getenv('SESSION_BACKEND', 'memory').lower(),
+        'max_sessions': int(os.getenv('SESSION_STORE_MAX_SESSIONS', '1000')),
+        'idle_ttl': float(os.getenv('SESSION_STORE_IDLE_TTL_SECONDS', '1800')),
+        'sqlite_path': os.getenv('SESSION_SQLITE_PATH', 'sessions.sqlite3'),
+        'redis_url': os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0'),
+        'max_retries': int(os.getenv('SESSION_UPDATE_MAX_RETRIES', '5'))
+    }
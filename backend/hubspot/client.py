@@ -0,0 +1,143 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from environment import get_hubspot_config, get_hubspot_client_config
+
+HUBSPOT_API_BASE = "https://api.hubapi.com"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: at most `capacity` requests per `window_seconds`"""
+
+    def __init__(self, capacity, window_seconds):
+        self.capacity = float(capacity)
+        self.refill_rate = capacity / window_seconds
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.waits = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.refill_rate
+                if not waited:
+                    self.waits += 1
+                    waited = True
+            time.sleep(wait)
+
+
+class HubSpotClient:
+    """
+    Shared HubSpot CRM client.
+
+    One keep-alive requests.Session is reused by every thread, every call has
+    a timeout, and all calls draw from one token bucket sized to HubSpot's
+    per-10-second limit. 429 and 5xx responses (and connection errors) are
+    retried with exponential backoff plus jitter, honouring Retry-After.
+    """
+
+    def __init__(self, token, timeout=20, max_retries=4, requests_per_window=100, window_seconds=10, pool_size=10):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(requests_per_window, window_seconds)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json"
+        })
+
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def request(self, method, path, **kwargs):
+        """Send a request and return the response; raises requests.HTTPError once retries are exhausted"""
+        url = path if path.startswith("http") else f"{HUBSPOT_API_BASE}{path}"
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self.requests += 1
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt)
+                print(f"⚠️  HubSpot {method} {path} failed ({e.__class__.__name__}); retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                if response.status_code == 429:
+                    self.rate_limited += 1
+                delay = self._retry_delay(attempt, response)
+                print(f"⚠️  HubSpot {method} {path} returned {response.status_code}; retrying in {delay:.1f}s")
+            self.retries += 1
+            time.sleep(delay)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled_waits": self.bucket.waits
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_hubspot_client():
+    """Process-wide HubSpot client, or None if HubSpot isn't configured. Config is read once."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                hubspot_config = get_hubspot_config()
+                if not hubspot_config:
+                    return None
+                client_config = get_hubspot_client_config()
+                _client = HubSpotClient(
+                    hubspot_config['token'],
+                    timeout=client_config['timeout'],
+                    max_retries=client_config['max_retries'],
+                    requests_per_window=client_config['requests_per_10s'],
+                    window_seconds=10,
+                    pool_size=client_config['pool_size']
+                )
+    return _client
@@ -0,0 +1,112 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ContactIdResolver:
+    """
+    Resolves an email to a HubSpot contact id with as few CRM calls as possible.
+
+    Lookup order: in-process TTL cache, then the id already stored in MongoDB
+    (lookup_stored), and only on a true miss create_contact, which searches and
+    upserts in HubSpot. Concurrent resolves for the same email share one
+    lookup. Results have the same shape as create_hubspot_contact.
+    """
+
+    def __init__(self, lookup_stored, create_contact, ttl_seconds=3600, max_entries=10000):
+        self.lookup_stored = lookup_stored
+        self.create_contact = create_contact
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # email -> (contact_id, cached_at)
+        self._flights = {}
+
+        self.cache_hits = 0
+        self.store_hits = 0
+        self.crm_lookups = 0
+        self.shared = 0
+
+    def _cached(self, email):
+        entry = self._cache.get(email)
+        if entry and time.time() - entry[1] < self.ttl_seconds:
+            self._cache.move_to_end(email)
+            return entry[0]
+        self._cache.pop(email, None)
+        return None
+
+    def remember(self, email, contact_id):
+        email = normalize_email(email)
+        if not email or not contact_id:
+            return
+        with self._lock:
+            self._cache[email] = (contact_id, time.time())
+            self._cache.move_to_end(email)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def resolve(self, email):
+        key = normalize_email(email)
+        with self._lock:
+            contact_id = self._cached(key)
+            if contact_id:
+                self.cache_hits += 1
+                return {"success": True, "action": "cached", "contact_id": contact_id, "message": "Contact id from cache"}
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            flight.result = self._lookup(email)
+        except Exception as e:
+            flight.result = {"success": False, "error": f"Contact lookup failed: {e}"}
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result
+
+    def _lookup(self, email):
+        try:
+            contact_id = self.lookup_stored(email)
+        except Exception as e:
+            print(f"⚠️  Stored contact id lookup failed for {email}: {e}")
+            contact_id = None
+        if contact_id:
+            self.store_hits += 1
+            self.remember(email, contact_id)
+            return {"success": True, "action": "existing", "contact_id": contact_id, "message": "Contact id from database"}
+
+        self.crm_lookups += 1
+        result = self.create_contact(email)
+        if result.get("success") and result.get("contact_id"):
+            self.remember(email, result["contact_id"])
+        return result
+
+    def stats(self):
+        resolves = self.cache_hits + self.store_hits + self.crm_lookups
+        return {
+            "entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "store_hits": self.store_hits,
+            "crm_lookups": self.crm_lookups,
+            "shared_lookups": self.shared,
+            "crm_avoided_ratio": round((self.cache_hits + self.store_hits) / resolves, 4) if resolves else 0.0
+        }
@@ -1,19 +1,42 @@
+import re
 import requests
+from hubspot.client import get_hubspot_client
 
-# HubSpot integration functions
-def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=None, company=None):
-    """Create or update a contact in HubSpot"""
-    try:
-        from environment import get_hubspot_config
+PROPERTY_MAX_LENGTH = 65536  # HubSpot rejects text property values longer than this
 
-        hubspot_config = get_hubspot_config()
 
-        if not hubspot_config:
-            print("⚠️  HubSpot configuration not available - skipping contact creation")
-            return {"success": False, "error": "HubSpot not configured"}
+def _fit_property(text):
+    """Trim a conversation to HubSpot's property limit, keeping the most recent part"""
+    return text if len(text) <= PROPERTY_MAX_LENGTH else text[-PROPERTY_MAX_LENGTH:]
+
+
+def _search_contact_by_email(client, email):
+    """Return the id of the HubSpot contact with this email, or None"""
+    search_payload = {
+        "filterGroups": [{
+            "filters": [{
+                "propertyName": "email",
+                "operator": "EQ",
+                "value": email
+            }]
+        }],
+        "properties": ["email"],
+        "limit": 1
+    }
+    search_response = client.post("/crm/v3/objects/contacts/search", json=search_payload)
+    results = search_response.json().get("results", [])
+    return results[0]["id"] if results else None
 
-        import requests
 
+# HubSpot integration functions
+def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=None, company=None):
+    """Create or update a contact in HubSpot"""
+    client = get_hubspot_client()
+    if not client:
+        print("⚠️  HubSpot configuration not available - skipping contact creation")
+        return {"success": False, "error": "HubSpot not configured"}
+
+    try:
         # Prepare contact properties
         properties = {
             "email": email
@@ -29,37 +52,11 @@ def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=
             properties["company"] = company
 
         # 1. Search for existing contact by email
-        search_url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-        search_payload = {
-            "filterGroups": [{
-                "filters": [{
-                    "propertyName": "email",
-                    "operator": "EQ",
-                    "value": email
-                }]
-            }],
-            "properties": ["email"],
-            "limit": 1
-        }
+        contact_id = _search_contact_by_email(client, email)
 
-        headers = {
-            "Authorization": f"Bearer {hubspot_config['token']}",
-            "Content-Type": "application/json"
-        }
-
-        search_response = requests.post(search_url, json=search_payload, headers=headers)
-        search_response.raise_for_status()
-
-        existing_contacts = search_response.json().get("results", [])
-
-        if existing_contacts:
+        if contact_id:
             # 2. Update existing contact
-            contact_id = existing_contacts[0]["id"]
-            update_url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-
-            update_payload = {"properties": properties}
-            update_response = requests.patch(update_url, json=update_payload, headers=headers)
-            update_response.raise_for_status()
+            client.patch(f"/crm/v3/objects/contacts/{contact_id}", json={"properties": properties})
 
             print(f"✅ HubSpot contact updated: {email}")
             return {
@@ -70,11 +67,7 @@ def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=
             }
         else:
             # 3. Create new contact
-            create_url = "https://api.hubapi.com/crm/v3/objects/contacts"
-            create_payload = {"properties": properties}
-
-            create_response = requests.post(create_url, json=create_payload, headers=headers)
-            create_response.raise_for_status()
+            create_response = client.post("/crm/v3/objects/contacts", json={"properties": properties})
 
             new_contact = create_response.json()
             print(f"✅ HubSpot contact created: {email}")
@@ -91,8 +84,7 @@ def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=
             if hasattr(e, 'response') and e.response is not None and e.response.status_code == 409:
                 resp_text = e.response.text or ""
                 # Try to extract Existing ID from error text
-                import re as _re
-                m = _re.search(r"Existing ID:\s*(\d+)", resp_text)
+                m = re.search(r"Existing ID:\s*(\d+)", resp_text)
                 if m:
                     existing_id = m.group(1)
                     print(f"ℹ️  Conflict received; using existing HubSpot contact ID: {existing_id}")
@@ -103,37 +95,15 @@ def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=
                         "message": "Contact already existed — using existing ID"
                     }
                 # Fallback: run a search by email to fetch the ID
-                from environment import get_hubspot_config
-                hubspot_config = get_hubspot_config()
-                if hubspot_config:
-                    import requests as _rq
-                    headers = {
-                        "Authorization": f"Bearer {hubspot_config['token']}",
-                        "Content-Type": "application/json"
-                    }
-                    search_url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-                    search_payload = {
-                        "filterGroups": [{
-                            "filters": [{
-                                "propertyName": "email",
-                                "operator": "EQ",
-                                "value": email
-                            }]
-                        }],
-                        "limit": 1
+                existing_id = _search_contact_by_email(client, email)
+                if existing_id:
+                    print(f"ℹ️  Conflict; found existing contact via search: {existing_id}")
+                    return {
+                        "success": True,
+                        "action": "existing",
+                        "contact_id": existing_id,
+                        "message": "Contact already existed — resolved via search"
                     }
-                    s_resp = _rq.post(search_url, json=search_payload, headers=headers, timeout=20)
-                    if s_resp.ok:
-                        results = s_resp.json().get("results", [])
-                        if results:
-                            existing_id = results[0].get("id")
-                            print(f"ℹ️  Conflict; found existing contact via search: {existing_id}")
-                            return {
-                                "success": True,
-                                "action": "existing",
-                                "contact_id": existing_id,
-                                "message": "Contact already existed — resolved via search"
-                            }
         except Exception as parse_err:
             print(f"⚠️  Failed handling 409 fallback: {parse_err}")
         error_msg = f"HubSpot API request failed: {str(e)}"
@@ -150,27 +120,40 @@ def create_hubspot_contact(email, phone_number=None, first_name=None, last_name=
 def hubspot_patch_conversation(contact_id: str, conversation_text: str):
     """Patch chatbot_conversation property for a HubSpot contact"""
     try:
-        from environment import get_hubspot_config
-        hubspot_config = get_hubspot_config()
-        if not hubspot_config:
+        client = get_hubspot_client()
+        if not client:
             return {"success": False, "error": "HubSpot not configured"}
 
-        import requests
-        url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-        headers = {
-            "Authorization": f"Bearer {hubspot_config['token']}",
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
         payload = {
             "properties": {
-                "chatbot_conversation": conversation_text
+                "chatbot_conversation": _fit_property(conversation_text)
             }
         }
-        resp = requests.patch(url, json=payload, headers=headers, timeout=20)
-        resp.raise_for_status()
+        client.patch(f"/crm/v3/objects/contacts/{contact_id}", json=payload)
         print(f"✅ HubSpot conversation patched for contact {contact_id}")
         return {"success": True}
     except Exception as e:
         print(f"❌ HubSpot PATCH failed: {e}")
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        response = getattr(e, "response", None)
+        return {"success": False, "error": str(e), "status_code": getattr(response, "status_code", None)}
+
+
+def hubspot_batch_update_conversations(conversations: dict):
+    """Set chatbot_conversation on up to 100 contacts in one CRM batch call ({contact_id: text})"""
+    client = get_hubspot_client()
+    if not client:
+        return {"success": False, "error": "HubSpot not configured"}
+
+    inputs = [
+        {"id": contact_id, "properties": {"chatbot_conversation": _fit_property(text)}}
+        for contact_id, text in conversations.items()
+    ]
+    response = client.post("/crm/v3/objects/contacts/batch/update", json={"inputs": inputs})
+    body = response.json() if response.content else {}
+    updated = [str(result.get("id")) for result in body.get("results", [])]
+    errors = body.get("errors", [])
+    # 207 Multi-Status: some inputs failed, the rest were applied
+    for error in errors:
+        print(f"⚠️  HubSpot batch update error: {error.get('message', error)}")
+    print(f"✅ HubSpot conversations batch-updated for {len(updated)} contact(s)")
+    return {"success": True, "updated": updated, "errors": errors}
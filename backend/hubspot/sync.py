@@ -0,0 +1,150 @@
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from environment import get_hubspot_sync_config
+from hubspot.hubspot import hubspot_batch_update_conversations, hubspot_patch_conversation
+from chatbot.chatbot import build_conversation_text
+from mongodb_operations import mongodb_manager
+from persistence.dirty_sync import DirtySetSync, status_code, is_transient, is_transient_status
+
+BATCH_LIMIT = 100  # HubSpot's maximum inputs per batch/update call
+MAX_TRACKED_CONTACTS = 10000
+
+
+class HubSpotSyncWorker(DirtySetSync):
+    """
+    Periodic, batched push of chat conversations to HubSpot.
+
+    Chat turns only mark their contact dirty. Every flush_interval seconds the
+    latest conversation of each dirty contact is sent with one
+    contacts/batch/update call per 100 contacts, and hubspot_last_sync_at is
+    recorded for all synced sessions with one bulk write. API calls scale
+    with active contacts per interval rather than with messages. A hash of
+    the last conversation pushed per contact is kept, and contacts whose
+    conversation text hasn't changed since are skipped.
+
+    Only rate limits, 5xx and network errors hold back the whole dirty set
+    (with backoff). A batch rejected for its input is retried contact by
+    contact so one bad contact can't block the rest, and contacts that fail
+    inside a 207 response are retried on later flushes (see DirtySetSync).
+    """
+
+    label = "HubSpot"
+
+    def __init__(self, flush_interval=30.0, batch_size=BATCH_LIMIT, max_backoff=300.0):
+        super().__init__(flush_interval, max_backoff=max_backoff)
+        self.batch_size = min(batch_size, BATCH_LIMIT)
+        self._pushed_hashes = OrderedDict()  # contact_id -> sha256 of the last conversation HubSpot accepted
+
+        self.api_calls = 0
+        self.contacts_synced = 0
+        self.unchanged_skipped = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def start(self):
+        return super().start("hubspot-sync")
+
+    def mark_dirty(self, contact_id, session_id, messages):
+        self.mark(contact_id, {"session_id": session_id, "messages": list(messages)})
+
+    def _send(self, pending):
+        contact_ids = list(pending)
+        for start in range(0, len(contact_ids), self.batch_size):
+            chunk = {contact_id: pending[contact_id] for contact_id in contact_ids[start:start + self.batch_size]}
+            if not self._send_chunk(chunk):
+                return {contact_id: pending[contact_id] for contact_id in contact_ids[start:]}
+        return None
+
+    def _send_chunk(self, chunk):
+        """Push one batch; returns False only when HubSpot is unavailable and the rest should wait"""
+        conversations, hashes, sizes = {}, {}, {}
+        for contact_id, state in chunk.items():
+            text = build_conversation_text(state["messages"], state["session_id"])
+            encoded = text.encode("utf-8")
+            digest = hashlib.sha256(encoded).hexdigest()
+            if self._pushed_hashes.get(contact_id) == digest:
+                self.unchanged_skipped += 1
+                self.bytes_saved += len(encoded)
+                continue
+            conversations[contact_id] = text
+            hashes[contact_id] = digest
+            sizes[contact_id] = len(encoded)
+        if not conversations:
+            return True
+
+        try:
+            result = hubspot_batch_update_conversations(conversations)
+        except Exception as e:
+            self.api_calls += 1
+            self.errors += 1
+            if is_transient(e):
+                self._back_off(e)
+                return False
+            # The batch fails as a whole if any input is rejected (deleted/merged contact, invalid value)
+            print(f"⚠️  HubSpot batch sync rejected ({status_code(e) or e}); updating contacts one by one")
+            self._send_individually(chunk, conversations, hashes, sizes)
+            return True
+
+        self.api_calls += 1
+        if not result.get("success"):
+            print(f"⚠️  HubSpot sync skipped: {result.get('error')}")
+            return True  # not configured - nothing to retry
+
+        self.bytes_sent += sum(sizes.values())
+        updated = set(result["updated"])
+        self._record_synced(chunk, hashes, updated)
+        # 207 Multi-Status: the inputs listed in "errors" (and any other input not in "results") weren't applied
+        failed = {contact_id: chunk[contact_id] for contact_id in conversations if str(contact_id) not in updated}
+        if failed:
+            self.errors += 1
+            self._retry_later(failed)
+        return True
+
+    def _send_individually(self, chunk, conversations, hashes, sizes):
+        updated = set()
+        for contact_id, text in conversations.items():
+            result = hubspot_patch_conversation(contact_id, text)
+            self.api_calls += 1
+            self.bytes_sent += sizes[contact_id]
+            if result.get("success"):
+                updated.add(str(contact_id))
+            elif result.get("status_code") is None or is_transient_status(result["status_code"]):
+                self._retry_later({contact_id: chunk[contact_id]})
+            else:
+                print(f"⚠️  Dropping HubSpot sync for contact {contact_id}: {result.get('error')}")
+        self._record_synced(chunk, hashes, updated)
+
+    def _record_synced(self, chunk, hashes, updated):
+        for contact_id, digest in hashes.items():
+            if str(contact_id) in updated:
+                self._remember_pushed(contact_id, digest)
+        synced = [state["session_id"] for contact_id, state in chunk.items() if str(contact_id) in updated]
+        self.contacts_synced += len(synced)
+        if synced:
+            mongodb_manager.update_hubspot_last_sync_many(synced, datetime.utcnow().isoformat() + "Z")
+
+    def _remember_pushed(self, contact_id, digest):
+        self._pushed_hashes[contact_id] = digest
+        self._pushed_hashes.move_to_end(contact_id)
+        while len(self._pushed_hashes) > MAX_TRACKED_CONTACTS:
+            self._pushed_hashes.popitem(last=False)
+
+    def stats(self):
+        pending, stats = self._queue_stats()
+        return {
+            "pending_contacts": pending,
+            **stats,
+            "api_calls": self.api_calls,
+            "contacts_synced": self.contacts_synced,
+            "unchanged_skipped": self.unchanged_skipped,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved
+        }
+
+hubspot_sync_config = get_hubspot_sync_config()
+hubspot_sync_worker = HubSpotSyncWorker(
+    flush_interval=hubspot_sync_config['flush_interval'],
+    batch_size=hubspot_sync_config['batch_size'],
+    max_backoff=hubspot_sync_config['max_backoff']
+).start() if hubspot_sync_config['enabled'] else None
@@ -0,0 +1,204 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from documents_processing_responses.document_processing import load_documents_from_directory, preprocess_documents
+from embeddings.embedding_generation import generate_embeddings, EMBEDDING_MODEL
+from db_operations import upsert_documents_into_db
+
+# Manifest lives next to the Chroma store so both are wiped/copied together
+MANIFEST_PATH = "chroma_ingestion_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_chunk_text(text):
+    """Content hash used to detect changed chunks"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Load the ingestion manifest, returning an empty one if missing or unreadable"""
+    empty = {"version": MANIFEST_VERSION, "chunks": {}}
+    if not os.path.exists(manifest_path):
+        return empty
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION or not isinstance(manifest.get("chunks"), dict):
+            print(f"⚠️  Ingestion manifest {manifest_path} has an unknown format - rebuilding")
+            return empty
+        return manifest
+    except Exception as e:
+        print(f"⚠️  Failed to read ingestion manifest {manifest_path}: {e}")
+        return empty
+
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """Write the manifest atomically so a crash mid-write never leaves a torn file"""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def compute_knowledge_base_version(manifest):
+    """Fingerprint of everything currently ingested; changes whenever any chunk is added, edited or removed"""
+    digest = hashlib.sha256()
+    for chunk_id in sorted(manifest["chunks"]):
+        entry = manifest["chunks"][chunk_id]
+        digest.update(f"{chunk_id}\0{entry.get('hash')}\0{entry.get('embedding_model')}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+_version_cache = {"path": None, "mtime": None, "version": None}
+
+def get_knowledge_base_version(manifest_path=MANIFEST_PATH):
+    """Current knowledge base version, re-read only when the manifest file changes (e.g. another worker re-ingested)"""
+    try:
+        mtime = os.path.getmtime(manifest_path)
+    except OSError:
+        return None
+    if _version_cache["path"] != manifest_path or _version_cache["mtime"] != mtime:
+        manifest = load_manifest(manifest_path)
+        _version_cache.update({
+            "path": manifest_path,
+            "mtime": mtime,
+            "version": manifest.get("kb_version") or compute_knowledge_base_version(manifest)
+        })
+    return _version_cache["version"]
+
+
+def _existing_documents(collection, ids):
+    """Return {id: document} for ids already stored in the collection"""
+    if not ids:
+        return {}
+    try:
+        result = collection.get(ids=ids, include=["documents"])
+        return dict(zip(result.get("ids", []), result.get("documents", [])))
+    except Exception as e:
+        print(f"⚠️  Could not read existing chunks from ChromaDB: {e}")
+        return {}
+
+
+def _all_stored_ids(collection, page_size=1000):
+    """Every chunk id currently in the collection"""
+    ids = []
+    offset = 0
+    while True:
+        result = collection.get(include=[], limit=page_size, offset=offset)
+        page = result.get("ids", [])
+        ids.extend(page)
+        if len(page) < page_size:
+            return ids
+        offset += page_size
+
+
+def sync_knowledge_base(client, collection, directory_path="./data", manifest_path=MANIFEST_PATH):
+    """
+    Bring the Chroma collection in line with the documents in directory_path.
+
+    Only chunks that are new, whose text changed, or that were embedded with a
+    different model are embedded and upserted. Chunks that no longer exist
+    (e.g. their source file was removed) are deleted. An unchanged data
+    directory results in zero embedding calls.
+    """
+    print("==== Syncing knowledge base ====")
+    documents = load_documents_from_directory(directory_path)
+    chunked_documents = preprocess_documents(documents)
+
+    manifest = load_manifest(manifest_path)
+    known_chunks = manifest["chunks"]
+    current_ids = [doc["id"] for doc in chunked_documents]
+    current_id_set = set(current_ids)
+
+    # Make sure every chunk the manifest claims is ingested is really in the store
+    stored_documents = _existing_documents(collection, current_ids)
+
+    pending = []
+    adopted = []
+    for doc in chunked_documents:
+        content_hash = hash_chunk_text(doc["text"])
+        entry = known_chunks.get(doc["id"])
+        up_to_date = (
+            entry is not None
+            and entry.get("hash") == content_hash
+            and entry.get("embedding_model") == EMBEDDING_MODEL
+            and doc["id"] in stored_documents
+        )
+        # No manifest yet (first boot after upgrade): adopt chunks already stored with identical text
+        adoptable = entry is None and stored_documents.get(doc["id"]) == doc["text"]
+
+        if up_to_date or adoptable:
+            if adoptable:
+                adopted.append(doc)
+            known_chunks[doc["id"]] = {
+                "hash": content_hash,
+                "embedding_model": EMBEDDING_MODEL,
+                "source_file": doc["source_file"],
+            }
+        else:
+            doc["content_hash"] = content_hash
+            pending.append(doc)
+
+    stale_ids = [chunk_id for chunk_id in known_chunks if chunk_id not in current_id_set]
+    if not os.path.exists(manifest_path):
+        # No manifest yet: chunks stored by earlier runs aren't tracked, so compare against the store itself
+        try:
+            untracked = [chunk_id for chunk_id in _all_stored_ids(collection) if chunk_id not in current_id_set]
+            stale_ids.extend(chunk_id for chunk_id in untracked if chunk_id not in known_chunks)
+        except Exception as e:
+            print(f"⚠️  Could not list existing chunks in ChromaDB: {e}")
+
+    if pending:
+        print(f"📄 {len(pending)} new or changed chunks to embed ({len(chunked_documents) - len(pending)} unchanged)")
+        pending = generate_embeddings(client, pending)
+        upsert_documents_into_db(collection, pending)
+        for doc in pending:
+            known_chunks[doc["id"]] = {
+                "hash": doc["content_hash"],
+                "embedding_model": EMBEDDING_MODEL,
+                "source_file": doc["source_file"],
+            }
+    else:
+        print("✅ Knowledge base unchanged - no embeddings generated")
+
+    if adopted:
+        # Chunks stored before metadata was tracked: attach it without re-embedding
+        try:
+            collection.update(
+                ids=[doc["id"] for doc in adopted],
+                metadatas=[{"source_file": doc["source_file"], "chunk_index": doc["chunk_index"]} for doc in adopted]
+            )
+        except Exception as e:
+            print(f"⚠️  Failed to attach metadata to existing chunks: {e}")
+
+    stale_deleted = False
+    if stale_ids:
+        print(f"🗑️  Removing {len(stale_ids)} chunks whose source is gone")
+        try:
+            collection.delete(ids=stale_ids)
+            stale_deleted = True
+        except Exception as e:
+            # Their manifest entries stay, so the next run tries again
+            print(f"⚠️  Failed to delete stale chunks from ChromaDB: {e}")
+        if stale_deleted:
+            for chunk_id in stale_ids:
+                known_chunks.pop(chunk_id, None)
+
+    if stale_ids and not stale_deleted and not os.path.exists(manifest_path):
+        # The store scan only runs while there is no manifest; don't write one until the untracked chunks are gone
+        print("⚠️  Ingestion manifest not written; stale chunks will be looked for again on the next run")
+    elif pending or stale_deleted or adopted or not os.path.exists(manifest_path):
+        manifest["updated_at"] = datetime.now().isoformat()
+        manifest["kb_version"] = compute_knowledge_base_version(manifest)
+        try:
+            save_manifest(manifest, manifest_path)
+        except Exception as e:
+            print(f"⚠️  Failed to write ingestion manifest: {e}")
+
+    return {
+        "kb_version": manifest.get("kb_version") or compute_knowledge_base_version(manifest),
+        "total_chunks": len(chunked_documents),
+        "embedded": len(pending),
+        "deleted": len(stale_ids) if stale_deleted else 0,
+    }
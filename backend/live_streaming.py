@@ -1,8 +1,12 @@
-from flask import Flask, Response
-from flask_socketio import SocketIO
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
 from openai import OpenAI
 from dotenv import load_dotenv
-import tempfile, os
+import os
+import threading
+from collections import deque
+from speech.pipeline import pipelined_speech, transcribe_audio, synthesize_sentence, speech_config
+from speech.vad import UtteranceAssembler, pcm_to_wav
 
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")  # WebSocket support
@@ -11,57 +15,129 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Socket.IO runs each event in its own thread, so chunks can be handled out of order; the client
+# numbers them and up to this many early chunks wait for a missing one before it is skipped
+MAX_REORDER_CHUNKS = 50
+
+# Per-connection state, keyed by Socket.IO session id, so concurrent clients never share buffers
+connections = {}
+connections_lock = threading.Lock()
+
+def get_connection_state(sid):
+    with connections_lock:
+        if sid not in connections:
+            connections[sid] = {
+                "lock": threading.Lock(),
+                "buffer_lock": threading.Lock(),
+                # Mic audio arrives as raw 16-bit mono PCM; the assembler cuts it into utterances
+                "assembler": UtteranceAssembler(),
+                "next_seq": 0,
+                "early_chunks": {},
+                "end_seq": None,
+                "utterances": deque(),
+                "turns": 0
+            }
+        return connections[sid]
+
 @socketio.on("connect")
 def on_connect():
-    print("✅ Client connected")
+    get_connection_state(request.sid)
+    print(f"✅ Client connected: {request.sid}")
 
 @socketio.on("disconnect")
 def on_disconnect():
-    print("❌ Client disconnected")
+    with connections_lock:
+        connections.pop(request.sid, None)
+    print(f"❌ Client disconnected: {request.sid}")
+
+def _accept_chunk(state, seq, pcm):
+    """Feed chunks to the assembler in sequence order; caller holds buffer_lock"""
+    if seq < state["next_seq"]:
+        return
+    early = state["early_chunks"]
+    early[seq] = pcm
+    if len(early) > MAX_REORDER_CHUNKS:
+        state["next_seq"] = min(early)
+    while state["next_seq"] in early:
+        state["utterances"].extend(state["assembler"].feed(early.pop(state["next_seq"])))
+        state["next_seq"] += 1
+    _flush_if_ended(state)
+
+def _flush_if_ended(state):
+    if state["end_seq"] is not None and state["next_seq"] >= state["end_seq"]:
+        state["utterances"].extend(state["assembler"].flush())
+        state["end_seq"] = None
 
 @socketio.on("audio_chunk")
 def handle_audio_chunk(data):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-        tmp.write(data)
-        tmp_path = tmp.name
-
-    try:
-        # STT
-        with open(tmp_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(model="whisper-1", file=f)
-        text = transcript.text.strip()
-        print("🎤 User:", text)
-
-        if not text:
-            return
-
-        # GPT
-        chat_resp = client.chat.completions.create(
+    state = get_connection_state(request.sid)
+    with state["buffer_lock"]:
+        if isinstance(data, dict):
+            _accept_chunk(state, int(data["seq"]), bytes(data["pcm"]))
+        else:
+            # Unnumbered chunks (older clients) are taken in arrival order
+            state["utterances"].extend(state["assembler"].feed(bytes(data)))
+    # Only a finished utterance costs a transcription; partial speech just stays buffered
+    run_pending_turns(state)
+
+@socketio.on("audio_end")
+def handle_audio_end(data=None):
+    """Client stopped recording: treat any speech in progress as a finished utterance"""
+    state = get_connection_state(request.sid)
+    with state["buffer_lock"]:
+        if isinstance(data, dict) and "chunks" in data:
+            # Flush once every chunk sent before the end has been fed
+            state["end_seq"] = int(data["chunks"])
+            _flush_if_ended(state)
+        else:
+            state["utterances"].extend(state["assembler"].flush())
+    run_pending_turns(state)
+
+def run_pending_turns(state):
+    """Answer finished utterances one at a time, in the order they were spoken"""
+    while True:
+        with state["lock"]:
+            with state["buffer_lock"]:
+                if not state["utterances"]:
+                    return
+                pcm = state["utterances"].popleft()
+            run_turn(state, pcm)
+
+def run_turn(state, pcm):
+    # Called with the connection's turn lock held: one turn at a time per client; other clients are unaffected
+    state["turns"] += 1
+
+    # STT straight from memory, exactly one request per utterance
+    wav = pcm_to_wav(pcm, state["assembler"].sample_rate)
+    text = transcribe_audio(client, wav, "utterance.wav")
+    print("🎤 User:", text)
+
+    if not text:
+        return
+    emit("transcript", {"text": text})
+
+    if speech_config['pipelined']:
+        # Stream the answer and emit audio sentence by sentence, in order
+        stream = client.chat.completions.create(
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": text}]
+            messages=[{"role": "user", "content": text}],
+            stream=True
         )
-        ai_text = chat_resp.choices[0].message.content
-        print("🤖 AI:", ai_text)
-
-        # TTS to a unique file
-        audio_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-        with client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",
-            input=ai_text,
-            response_format="mp3"
-        ) as resp:
-            resp.stream_to_file("audio/audio.mp3")
-
-        # send the *whole mp3 file* back
-        with open("audio/audio.mp3", "rb") as f:
-            audio_bytes = f.read()
-            # socketio.emit("audio_response", f.read(), broadcast=False)
-        os.remove("audio/audio.mp3")
-
-    finally:
-        os.remove(tmp_path)
-    return Response(response=audio_bytes, content_type="audio/mpeg")
+        tokens = (chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+        for segment in pipelined_speech(client, tokens):
+            emit("audio_response", segment)
+        return
+
+    # GPT
+    chat_resp = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": text}]
+    )
+    ai_text = chat_resp.choices[0].message.content
+    print("🤖 AI:", ai_text)
+
+    # TTS into memory and send the whole mp3 back to this client only
+    emit("audio_response", synthesize_sentence(client, ai_text))
 
 
 if __name__ == "__main__":
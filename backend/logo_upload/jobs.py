@@ -0,0 +1,208 @@
+import os
+import time
+import hashlib
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logo_upload.logo_upload import upload_stream, get_shared_link
+
+# Fields returned by the status endpoint
+PUBLIC_FIELDS = ("job_id", "session_id", "filename", "content_hash", "deduplicated", "status", "bytes_total", "bytes_uploaded", "progress", "dropbox_url", "error", "created_at", "finished_at")
+PROGRESS_SAVE_INTERVAL = 1.0  # seconds between byte-progress writes to the shared job store
+
+
+def hash_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def logo_dropbox_path(session_id, content_hash, original_filename):
+    """Logos are named by content, so the same artwork maps to the same file"""
+    filename = f"logo_{content_hash[:16]}_{original_filename}"
+    return filename, f"/logos/{session_id}/{filename}"
+
+
+class LogoUploadJobs:
+    """
+    Background Dropbox uploads for logos.
+
+    submit() spools the request file to local disk and returns a job right
+    away; a small thread pool streams the spooled file to Dropbox, creates
+    the shared link and calls on_complete(job) (or on_error(job, error)). Job state (queued, uploading,
+    sharing, done, failed) and byte progress can be polled with get().
+    Finished jobs are forgotten after job_ttl seconds.
+
+    The spooled file is hashed first; if find_duplicate(content_hash) knows
+    the artwork already, the job completes immediately with the stored
+    Dropbox link and no Dropbox calls.
+
+    Every state change is also written through save_job(public_job), and
+    get() falls back to load_job(job_id) for jobs this process isn't
+    running, so a status poll can be answered by any worker process.
+    """
+
+    def __init__(self, get_client, spool_dir="logo_upload_spool", workers=2, block_size=8 * 1024 * 1024, job_ttl=3600, on_complete=None, on_error=None, find_duplicate=None, save_job=None, load_job=None):
+        self.get_client = get_client
+        self.spool_dir = spool_dir
+        self.block_size = block_size
+        self.job_ttl = job_ttl
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.find_duplicate = find_duplicate
+        self.save_job = save_job
+        self.load_job = load_job
+        self.deduplicated = 0
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="logo-upload")
+
+    def submit(self, session_id, file, original_filename):
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(self.spool_dir, job_id)
+        file.save(spool_path)  # werkzeug copies the upload to disk in chunks
+        content_hash = hash_file(spool_path)
+        filename, dropbox_path = logo_dropbox_path(session_id, content_hash, original_filename)
+
+        job = {
+            "job_id": job_id,
+            "session_id": session_id,
+            "filename": filename,
+            "dropbox_path": dropbox_path,
+            "spool_path": spool_path,
+            "content_hash": content_hash,
+            "deduplicated": False,
+            "status": "queued",
+            "bytes_total": os.path.getsize(spool_path),
+            "bytes_uploaded": 0,
+            "progress": 0.0,
+            "dropbox_url": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._save(self._public(job))
+
+        existing = self._find_existing(content_hash)
+        if existing:
+            os.remove(spool_path)
+            self._update(job, status="done", deduplicated=True, progress=1.0, finished_at=time.time(),
+                         filename=existing.get("filename", filename), dropbox_path=existing.get("dropbox_path"),
+                         dropbox_url=existing["dropbox_url"], bytes_uploaded=job["bytes_total"])
+            self.deduplicated += 1
+            print(f"♻️  Logo {original_filename} already uploaded ({content_hash[:12]}) - reusing {existing['dropbox_url']}")
+            if self.on_complete:
+                self.on_complete(job)
+            return self._public(job)
+
+        self._executor.submit(self._run, job)
+        print(f"📥 Logo upload job {job_id} queued: {filename} ({job['bytes_total']} bytes)")
+        return self._public(job)
+
+    def _find_existing(self, content_hash):
+        if not self.find_duplicate:
+            return None
+        try:
+            existing = self.find_duplicate(content_hash)
+        except Exception as e:
+            print(f"⚠️  Logo duplicate lookup failed: {e}")
+            return None
+        return existing if existing and existing.get("dropbox_url") else None
+
+    def _update(self, job, save=True, **fields):
+        with self._lock:
+            job.update(fields)
+            public = self._public(job)
+        if save:
+            self._save(public)
+
+    def _save(self, public):
+        if not self.save_job:
+            return
+        try:
+            self.save_job(public)
+        except Exception as e:
+            print(f"⚠️  Failed to save logo upload job {public['job_id']}: {e}")
+
+    def _run(self, job):
+        try:
+            dbx = self.get_client()
+            if not dbx:
+                raise RuntimeError("Failed to connect to Dropbox")
+
+            self._update(job, status="uploading")
+
+            last_saved = [0.0]
+
+            def progress(sent):
+                total = job["bytes_total"] or 1
+                now = time.time()
+                # Byte progress is throttled; status changes are always written
+                save = now - last_saved[0] >= PROGRESS_SAVE_INTERVAL or sent >= total
+                if save:
+                    last_saved[0] = now
+                self._update(job, save=save, bytes_uploaded=sent, progress=round(min(1.0, sent / total), 4))
+
+            with open(job["spool_path"], "rb") as spooled:
+                upload_stream(dbx, spooled, job["dropbox_path"], block_size=self.block_size, progress=progress)
+            print(f"✅ Uploaded to Dropbox: {job['dropbox_path']}")
+
+            self._update(job, status="sharing")
+            dropbox_url = get_shared_link(dbx, job["dropbox_path"])
+            print(f"✅ Created shared link: {dropbox_url}")
+
+            self._update(job, dropbox_url=dropbox_url)
+            if self.on_complete:
+                self.on_complete(job)
+            self._update(job, status="done", progress=1.0, finished_at=time.time())
+
+        except Exception as e:
+            print(f"❌ Logo upload job {job['job_id']} failed: {e}")
+            self._update(job, status="failed", error=str(e), finished_at=time.time())
+            if self.on_error:
+                self.on_error(job, e)
+        finally:
+            try:
+                os.remove(job["spool_path"])
+            except OSError:
+                pass
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def _public(self, job):
+        return {field: job[field] for field in PUBLIC_FIELDS}
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return self._public(job)
+        if not self.load_job or not job_id.isalnum():
+            return None
+        # Submitted to (or finished by) another worker process
+        try:
+            job = self.load_job(job_id)
+        except Exception as e:
+            print(f"⚠️  Failed to load logo upload job {job_id}: {e}")
+            return None
+        return {field: job.get(field) for field in PUBLIC_FIELDS} if job else None
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        stats = {status: statuses.count(status) for status in ("queued", "uploading", "sharing", "done", "failed")}
+        stats["deduplicated"] = self.deduplicated
+        return stats
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,73 @@
+import dropbox
+
+
+def _read_block(stream, block_size):
+    """Read up to block_size bytes, looping over short reads from the stream"""
+    parts = []
+    remaining = block_size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(parts)
+
+
+def upload_stream(dbx, stream, dropbox_path, block_size=8 * 1024 * 1024, progress=None):
+    """
+    Upload a file-like object to Dropbox without reading it into memory whole.
+
+    Files that fit in one block go up with a single files_upload call; larger
+    ones use an upload session (start / append_v2 / finish). At most two
+    blocks are held in memory at a time. progress(bytes_sent) is called after
+    every block. Returns the number of bytes uploaded.
+    """
+    mode = dropbox.files.WriteMode.overwrite
+    block = _read_block(stream, block_size)
+    next_block = _read_block(stream, block_size)
+
+    if not next_block:
+        dbx.files_upload(block, dropbox_path, mode=mode)
+        if progress:
+            progress(len(block))
+        return len(block)
+
+    session = dbx.files_upload_session_start(block)
+    cursor = dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=len(block))
+    if progress:
+        progress(cursor.offset)
+
+    block = next_block
+    while True:
+        next_block = _read_block(stream, block_size)
+        if not next_block:
+            dbx.files_upload_session_finish(block, cursor, dropbox.files.CommitInfo(path=dropbox_path, mode=mode))
+            cursor.offset += len(block)
+            break
+        dbx.files_upload_session_append_v2(block, cursor)
+        cursor.offset += len(block)
+        if progress:
+            progress(cursor.offset)
+        block = next_block
+
+    if progress:
+        progress(cursor.offset)
+    return cursor.offset
+
+
+def get_shared_link(dbx, dropbox_path):
+    """Create (or reuse) a public link for a Dropbox file; returns a direct-download URL"""
+    try:
+        link_metadata = dbx.sharing_create_shared_link_with_settings(dropbox_path)
+    except dropbox.exceptions.ApiError as e:
+        # If link already exists, fetch it
+        if isinstance(e.error, dropbox.sharing.CreateSharedLinkWithSettingsError):
+            links = dbx.sharing_list_shared_links(dropbox_path).links
+            if links:
+                link_metadata = links[0]
+            else:
+                raise
+        else:
+            raise
+    return link_metadata.url.replace("?dl=0", "?dl=1")
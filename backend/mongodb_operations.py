@@ -1,8 +1,49 @@
-from pymongo import MongoClient
-from datetime import datetime
+from pymongo import MongoClient, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import OperationFailure, DuplicateKeyError
+from datetime import datetime, timedelta
 import os
+import time
 import json
-from environment import load_environment
+import threading
+from environment import load_environment, get_mongodb_config
+
+# Commands worth timing; handshake/heartbeat traffic is ignored
+_MONITORED_COMMANDS = {"find", "insert", "update", "delete", "aggregate", "count", "findAndModify", "getMore"}
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    """Logs any monitored command that takes longer than threshold_ms"""
+
+    def __init__(self, threshold_ms=100):
+        self.threshold_ms = threshold_ms
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+        self._started = {}  # request_id -> (collection, filter) of in-flight commands
+
+    def started(self, event):
+        if event.command_name not in _MONITORED_COMMANDS:
+            return
+        command = event.command
+        query = command.get("filter") or command.get("q") or command.get("query")
+        if query is None and command.get("updates"):
+            query = command["updates"][0].get("q")
+        with self._lock:
+            self._started[event.request_id] = (command.get(event.command_name), query)
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            collection, query = self._started.pop(event.request_id, (None, None))
+        duration_ms = event.duration_micros / 1000
+        if event.command_name in _MONITORED_COMMANDS and duration_ms >= self.threshold_ms:
+            self.slow_queries += 1
+            print(f"🐢 Slow MongoDB {event.command_name} on {collection} ({duration_ms:.0f}ms, {outcome}): {str(query)[:200]}")
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "failed")
+
 
 class MongoDBManager:
     def __init__(self):
@@ -19,25 +60,30 @@ class MongoDBManager:
         is_atlas = "mongodb+srv://" in mongodb_uri or "cluster" in mongodb_uri
         print(f"📍 Connection type: {'MongoDB Atlas' if is_atlas else 'Local MongoDB'}")
         
+        config = get_mongodb_config()
+        self.slow_query_logger = SlowQueryLogger(config['slow_query_ms'])
+        
         try:
-            self.client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=10000)
+            self.client = MongoClient(
+                mongodb_uri,
+                serverSelectionTimeoutMS=10000,
+                event_listeners=[self.slow_query_logger]
+            )
             # Test the connection
             self.client.admin.command('ping')
             self.db = self.client['signize_bot'] # db name changed
             self.quotes_collection = self.db['quotes']
+            self.logos_collection = self.db['logos']
+            self.logo_jobs_collection = self.db['logo_jobs']
             self.connected = True
             print("✅ MongoDB connected successfully")
             print(f"📊 Database: {self.db.name}")
             print(f"📋 Collection: {self.quotes_collection.name}")
             print(f"🌐 Connection: {'Atlas' if is_atlas else 'Local'}")
             
-            # Test write access
-            test_doc = {"test": "connection", "timestamp": datetime.now(), "connection_type": "atlas" if is_atlas else "local"}
-            result = self.quotes_collection.insert_one(test_doc)
-            print(f"✅ Write test successful - inserted document ID: {result.inserted_id}")
-            # Clean up test document
-            self.quotes_collection.delete_one({"_id": result.inserted_id})
-            print("✅ Test document cleaned up")
+            
+            if config['ensure_indexes']:
+                self.ensure_indexes()
             
         except Exception as e:
             print(f"⚠️  MongoDB connection failed: {e}")
@@ -46,6 +92,42 @@ class MongoDBManager:
             self.client = None
             self.db = None
             self.quotes_collection = None
+            self.logos_collection = None
+            self.logo_jobs_collection = None
+
+    def ensure_indexes(self):
+        """Create the indexes the session/quote lookups rely on; safe to run on every start"""
+        try:
+            self.quotes_collection.create_index([("session_id", ASCENDING)], unique=True, name="session_id_unique")
+        except OperationFailure as e:
+            if e.code != 11000:
+                print(f"⚠️  Could not create session_id index: {e}")
+            else:
+                # Older data can hold more than one document per session; still index the lookups
+                print("⚠️  Duplicate session_id documents found - creating a non-unique session_id index instead")
+                try:
+                    self.quotes_collection.create_index([("session_id", ASCENDING)], name="session_id")
+                except OperationFailure as fallback_error:
+                    print(f"⚠️  Could not create session_id index: {fallback_error}")
+        
+        for collection, keys, name, unique in (
+            (self.quotes_collection, [("email", ASCENDING)], "email", False),
+            (self.quotes_collection, [("type", ASCENDING), ("updated_at", DESCENDING)], "type_updated_at", False),
+            (self.logos_collection, [("session_id", ASCENDING), ("content_hash", ASCENDING)], "session_content_hash", True),
+            (self.logos_collection, [("content_hash", ASCENDING)], "content_hash", False),
+            (self.logo_jobs_collection, [("job_id", ASCENDING)], "job_id_unique", True)
+        ):
+            try:
+                collection.create_index(keys, name=name, unique=unique)
+            except OperationFailure as e:
+                print(f"⚠️  Could not create {name} index: {e}")
+        try:
+            # Finished upload jobs are removed by MongoDB once they expire
+            self.logo_jobs_collection.create_index([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0)
+        except OperationFailure as e:
+            print(f"⚠️  Could not create expires_at_ttl index: {e}")
+        
+        print(f"✅ MongoDB indexes ensured: {', '.join(self.quotes_collection.index_information())}; logos: {', '.join(self.logos_collection.index_information())}")
 
     def save_quote_data(self, session_id, email, form_data):
         """Save quote data to MongoDB or local file as fallback"""
@@ -290,6 +372,58 @@ class MongoDBManager:
             print(f"❌ Error saving HubSpot contact_id locally: {e}")
             return {"success": False, "error": str(e)}
 
+    def find_hubspot_contact_id(self, email):
+        """Return the HubSpot contact id already stored for this email, or None"""
+        emails = list({email, email.strip().lower()})
+        if not self.connected:
+            return self._find_hubspot_contact_id_locally(emails)
+        try:
+            doc = self.quotes_collection.find_one(
+                {"email": {"$in": emails}, "hubspot_contact_id": {"$nin": [None, ""]}},
+                {"hubspot_contact_id": 1},
+                sort=[("updated_at", -1)]
+            )
+            return doc["hubspot_contact_id"] if doc else None
+        except Exception as e:
+            print(f"❌ Error looking up HubSpot contact_id in MongoDB: {e}")
+            return self._find_hubspot_contact_id_locally(emails)
+
+    def _find_hubspot_contact_id_locally(self, emails):
+        """Scan local chat_sessions files for a stored HubSpot contact id"""
+        if not os.path.isdir("chat_sessions"):
+            return None
+        for filename in os.listdir("chat_sessions"):
+            try:
+                with open(os.path.join("chat_sessions", filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("email") in emails and data.get("hubspot_contact_id"):
+                    return data["hubspot_contact_id"]
+            except Exception:
+                continue
+        return None
+
+    def save_session_state(self, session_id, email, hubspot_contact_id=None):
+        """Persist the session fields that live outside the message list (used when a session leaves memory)"""
+        if not self.connected:
+            if hubspot_contact_id:
+                return self._update_hubspot_contact_id_locally(session_id, hubspot_contact_id)
+            return {"success": True}
+        try:
+            fields = {"updated_at": datetime.now()}
+            if email:
+                fields["email"] = email
+            if hubspot_contact_id:
+                fields["hubspot_contact_id"] = hubspot_contact_id
+            self.quotes_collection.update_one(
+                {"session_id": session_id},
+                {"$set": fields, "$setOnInsert": {"created_at": datetime.now(), "type": "chat_session"}},
+                upsert=True
+            )
+            return {"success": True}
+        except Exception as e:
+            print(f"❌ Error saving session state to MongoDB: {e}")
+            return {"success": False, "error": str(e)}
+
     def update_hubspot_last_sync(self, session_id, iso_timestamp: str):
         """Record last HubSpot sync time for a session"""
         if not self.connected:
@@ -308,6 +442,23 @@ class MongoDBManager:
             print(f"❌ Error saving HubSpot last sync time: {e}")
             return {"success": False, "error": str(e)}
 
+    def update_hubspot_last_sync_many(self, session_ids, iso_timestamp: str):
+        """Record the same HubSpot sync time for many sessions in one write"""
+        if not self.connected:
+            for session_id in session_ids:
+                self._update_hubspot_last_sync_locally(session_id, iso_timestamp)
+            return {"success": True}
+        try:
+            result = self.quotes_collection.update_many(
+                {"session_id": {"$in": list(session_ids)}},
+                {"$set": {"hubspot_last_sync_at": iso_timestamp, "updated_at": datetime.now()}}
+            )
+            print(f"✅ HubSpot last sync time saved for {result.matched_count} session(s)")
+            return {"success": True, "matched": result.matched_count}
+        except Exception as e:
+            print(f"❌ Error saving HubSpot last sync times: {e}")
+            return {"success": False, "error": str(e)}
+
     def _update_hubspot_last_sync_locally(self, session_id, iso_timestamp: str):
         try:
             os.makedirs("chat_sessions", exist_ok=True)
@@ -391,6 +542,78 @@ class MongoDBManager:
             print("   Falling back to local storage")
             return self._save_chat_session_locally(session_id, email, messages, phone_number)
 
+    def append_chat_turns(self, session_id, email, turns, phone_number=None):
+        """Append chat turns ([{"turn_id", "messages"}]) to a session; a turn already written is skipped (local file as fallback)"""
+        if not turns:
+            return {"success": True, "action": "unchanged", "session_id": session_id, "storage": "mongodb"}
+        if not self.connected:
+            return self._append_chat_turns_locally(session_id, email, turns, phone_number)
+        
+        try:
+            now = datetime.now()
+            set_fields = {
+                "email": email,
+                "updated_at": now,
+                "type": "chat_session"
+            }
+            if phone_number:
+                set_fields["phone_number"] = phone_number
+            
+            applied = 0
+            created = False
+            for turn in turns:
+                outcome = self._append_chat_turn(session_id, turn, set_fields, now)
+                applied += outcome != "already_applied"
+                created = created or outcome == "created"
+            
+            action = "created" if created else ("updated" if applied else "unchanged")
+            print(f"✅ {applied}/{len(turns)} turn(s) appended to chat session {session_id} ({action})")
+            return {"success": True, "action": action, "session_id": session_id, "storage": "mongodb"}
+                    
+        except Exception as e:
+            print(f"❌ Error appending chat turns in MongoDB: {e}")
+            print("   Falling back to local storage")
+            return self._append_chat_turns_locally(session_id, email, turns, phone_number)
+
+    def _append_chat_turn(self, session_id, turn, set_fields, now):
+        """Write one turn; returns appended, created or already_applied"""
+        messages = turn["messages"]
+        # Guarded on turn_id so a redelivered turn (the queue is at-least-once) isn't appended twice;
+        # $push/$inc are applied server-side, so concurrent turns can't overwrite each other's messages
+        guarded_filter = {"session_id": session_id, "turn_ids": {"$ne": turn["turn_id"]}}
+        guarded_update = {
+            "$push": {"messages": {"$each": messages}},
+            "$addToSet": {"turn_ids": turn["turn_id"]},
+            "$inc": {"message_count": len(messages)},
+            "$set": set_fields
+        }
+        if self.quotes_collection.update_one(guarded_filter, guarded_update).matched_count:
+            return "appended"
+        # No match: either there is no document for the session yet, or this turn is already in it.
+        # The _id is derived from the session, so two writers racing to create it can't both insert
+        # a document, even where the unique session_id index couldn't be built.
+        try:
+            result = self.quotes_collection.update_one(
+                {"session_id": session_id},
+                {"$setOnInsert": dict(
+                    set_fields,
+                    _id=f"chat_session:{session_id}",
+                    messages=messages,
+                    turn_ids=[turn["turn_id"]],
+                    message_count=len(messages),
+                    created_at=now
+                )},
+                upsert=True
+            )
+            if result.upserted_id:
+                return "created"
+        except DuplicateKeyError:
+            pass  # another writer created the document first
+        # The document exists now (created by someone else meanwhile); apply the turn unless it already is
+        if self.quotes_collection.update_one(guarded_filter, guarded_update).matched_count:
+            return "appended"
+        return "already_applied"
+
     def update_phone_number(self, session_id, phone_number):
         """Update phone number for a session"""
         if not self.connected:
@@ -483,6 +706,41 @@ class MongoDBManager:
             print(f"❌ Error saving chat session locally: {e}")
             return {"success": False, "error": str(e)}
 
+    def _append_chat_turns_locally(self, session_id, email, turns, phone_number=None):
+        """Append chat turns to the local JSON session file, skipping turns it already has"""
+        try:
+            os.makedirs("chat_sessions", exist_ok=True)
+            filename = f"chat_sessions/session_{session_id}.json"
+            session_data = {
+                "session_id": session_id,
+                "messages": [],
+                "created_at": datetime.now().isoformat()
+            }
+            if os.path.exists(filename):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    session_data = json.load(f)
+            
+            turn_ids = session_data.setdefault("turn_ids", [])
+            new_turns = [turn for turn in turns if turn["turn_id"] not in turn_ids]
+            for turn in new_turns:
+                session_data.setdefault("messages", []).extend(turn["messages"])
+                turn_ids.append(turn["turn_id"])
+            session_data["email"] = email
+            session_data["message_count"] = len(session_data.get("messages", []))
+            session_data["updated_at"] = datetime.now().isoformat()
+            if phone_number:
+                session_data["phone_number"] = phone_number
+            
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(session_data, f, indent=2, ensure_ascii=False, default=str)
+            
+            print(f"✅ {len(new_turns)}/{len(turns)} turn(s) appended locally to {filename}")
+            return {"success": True, "action": "updated", "filename": filename, "storage": "local"}
+            
+        except Exception as e:
+            print(f"❌ Error appending chat turns locally: {e}")
+            return {"success": False, "error": str(e)}
+
     def _get_chat_session_locally(self, session_id):
         """Get chat session from local JSON file"""
         try:
@@ -536,6 +794,134 @@ class MongoDBManager:
             print(f"❌ Error reading phone number locally: {e}")
             return {"success": False, "error": str(e)}
 
+    def find_logo_by_hash(self, content_hash):
+        """Return an already-uploaded logo with this content hash (any session), or None"""
+        if not self.connected:
+            return self._find_logo_by_hash_locally(content_hash)
+        try:
+            return self.logos_collection.find_one({"content_hash": content_hash}, {"_id": 0})
+        except Exception as e:
+            print(f"❌ Error looking up logo in MongoDB: {e}")
+            return self._find_logo_by_hash_locally(content_hash)
+
+    def save_logo(self, session_id, content_hash, logo_info):
+        """Add a logo to the session's logo index (one entry per session and content hash)"""
+        if not self.connected:
+            return self._save_logo_locally(session_id, content_hash, logo_info)
+        try:
+            self.logos_collection.update_one(
+                {"session_id": session_id, "content_hash": content_hash},
+                {"$setOnInsert": {**logo_info, "session_id": session_id, "content_hash": content_hash, "created_at": datetime.now()}},
+                upsert=True
+            )
+            print(f"✅ Logo indexed for session {session_id}: {logo_info.get('filename')}")
+            return {"success": True}
+        except Exception as e:
+            print(f"❌ Error saving logo to MongoDB: {e}")
+            return self._save_logo_locally(session_id, content_hash, logo_info)
+
+    def get_session_logos(self, session_id):
+        """List the logos uploaded for a session, oldest first"""
+        if not self.connected:
+            return self._load_logos_locally(session_id)
+        try:
+            return list(self.logos_collection.find({"session_id": session_id}, {"_id": 0}).sort("created_at", ASCENDING))
+        except Exception as e:
+            print(f"❌ Error getting logos from MongoDB: {e}")
+            return self._load_logos_locally(session_id)
+
+    def _load_logos_locally(self, session_id):
+        filename = f"logos/session_{session_id}.json"
+        if not os.path.exists(filename):
+            return []
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"❌ Error reading local logo index: {e}")
+            return []
+
+    def _save_logo_locally(self, session_id, content_hash, logo_info):
+        try:
+            os.makedirs("logos", exist_ok=True)
+            logos = self._load_logos_locally(session_id)
+            if not any(logo.get("content_hash") == content_hash for logo in logos):
+                logos.append({**logo_info, "session_id": session_id, "content_hash": content_hash, "created_at": datetime.now().isoformat()})
+                with open(f"logos/session_{session_id}.json", 'w', encoding='utf-8') as f:
+                    json.dump(logos, f, indent=2, ensure_ascii=False, default=str)
+            print(f"✅ Logo indexed locally for session {session_id}")
+            return {"success": True}
+        except Exception as e:
+            print(f"❌ Error saving logo locally: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _find_logo_by_hash_locally(self, content_hash):
+        if not os.path.isdir("logos"):
+            return None
+        for filename in os.listdir("logos"):
+            session_id = filename[len("session_"):-len(".json")]
+            for logo in self._load_logos_locally(session_id):
+                if logo.get("content_hash") == content_hash:
+                    return logo
+        return None
+
+    def save_logo_job(self, job, ttl_seconds):
+        """Store a logo upload job's state so any worker can answer status polls; it expires ttl_seconds after its last update"""
+        if not self.connected:
+            return self._save_logo_job_locally(job, ttl_seconds)
+        try:
+            self.logo_jobs_collection.update_one(
+                {"job_id": job["job_id"]},
+                {"$set": {**job, "expires_at": datetime.utcnow() + timedelta(seconds=ttl_seconds)}},
+                upsert=True
+            )
+            return {"success": True}
+        except Exception as e:
+            print(f"❌ Error saving logo upload job to MongoDB: {e}")
+            return self._save_logo_job_locally(job, ttl_seconds)
+
+    def get_logo_job(self, job_id):
+        """Return a logo upload job's stored state, or None"""
+        if not self.connected:
+            return self._get_logo_job_locally(job_id)
+        try:
+            return self.logo_jobs_collection.find_one({"job_id": job_id}, {"_id": 0, "expires_at": 0})
+        except Exception as e:
+            print(f"❌ Error getting logo upload job from MongoDB: {e}")
+            return self._get_logo_job_locally(job_id)
+
+    def _save_logo_job_locally(self, job, ttl_seconds):
+        try:
+            os.makedirs("logo_jobs", exist_ok=True)
+            filename = f"logo_jobs/job_{job['job_id']}.json"
+            # Written to a temp file and renamed so a poll from another worker never reads half a file
+            temp_name = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_name, 'w', encoding='utf-8') as f:
+                json.dump({**job, "expires_at": time.time() + ttl_seconds}, f, ensure_ascii=False, default=str)
+            os.replace(temp_name, filename)
+            return {"success": True}
+        except Exception as e:
+            print(f"❌ Error saving logo upload job locally: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _get_logo_job_locally(self, job_id):
+        filename = f"logo_jobs/job_{job_id}.json"
+        if not os.path.exists(filename):
+            return None
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except Exception as e:
+            print(f"❌ Error reading local logo upload job: {e}")
+            return None
+        if job.pop("expires_at", 0) < time.time():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            return None
+        return job
+
 
 def test_mongodb_connection():
     """Test MongoDB connection for debugging"""
@@ -0,0 +1,134 @@
+import time
+import threading
+import requests
+
+MAX_ATTEMPTS = 5  # a key the target keeps rejecting is dropped after this many flushes
+
+
+def status_code(error):
+    """HTTP status of a requests/gspread error, or None"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "code", None)
+
+
+def is_transient_status(status):
+    return status == 429 or (isinstance(status, int) and status >= 500)
+
+
+def is_transient(error):
+    """Rate limits, server errors and network failures are worth retrying; other errors are about the data"""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return is_transient_status(status_code(error))
+
+
+class DirtySetSync:
+    """
+    Coalescing, periodic sync of per-key state to an external service.
+
+    mark() records the latest state of a key; every flush_interval seconds a
+    background thread hands everything marked since the last flush to
+    _send(pending), so repeated changes to one key between flushes cost one
+    write. _send returns the states to put back when the service is
+    unavailable (after calling _back_off), and the loop then waits with
+    exponential backoff up to max_backoff. Keys the service rejects go
+    through _retry_later and are dropped after max_attempts flushes, so one
+    bad key can't block the rest.
+    """
+
+    label = "sync"
+
+    def __init__(self, flush_interval, max_backoff=300.0, max_attempts=MAX_ATTEMPTS):
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.backoff = 0.0
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._dirty = {}  # key -> state dict with "marked_at" (and "attempts" once rejected)
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def start(self, thread_name="dirty-sync"):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=thread_name, daemon=True)
+            self._thread.start()
+        return self
+
+    def mark(self, key, state):
+        with self._lock:
+            if key in self._dirty:
+                self.coalesced += 1
+                marked_at = self._dirty[key]["marked_at"]
+            else:
+                marked_at = time.time()
+            self._dirty[key] = dict(state, marked_at=marked_at)
+
+    def _run(self):
+        while not self._stop.wait(self.backoff or self.flush_interval):
+            self.flush()
+
+    def _requeue(self, batch):
+        """Put unsent state back without clobbering newer state marked since"""
+        with self._lock:
+            for key, state in batch.items():
+                self._dirty.setdefault(key, state)
+
+    def _retry_later(self, failed, error=None):
+        """Requeue keys the service rejected, dropping those that have failed too often"""
+        retry = {}
+        for key, state in failed.items():
+            attempts = state.get("attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                print(f"❌ Giving up {self.label} sync for {key} after {attempts} attempts{f': {error}' if error else ''}")
+                continue
+            retry[key] = dict(state, attempts=attempts)
+        self._requeue(retry)
+
+    def _back_off(self, error):
+        self.backoff = min(self.max_backoff, max(self.flush_interval, self.backoff * 2 or self.flush_interval * 2))
+        print(f"⚠️  {self.label} flush failed ({status_code(error) or error}); backing off {self.backoff:.0f}s")
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return True
+
+            unsent = self._send(pending)
+            if unsent:
+                self._requeue(unsent)
+                return False
+
+            self.flushes += 1
+            self.backoff = 0.0
+            return True
+
+    def _send(self, pending):
+        """Write pending ({key: state}); return the states to retry after a backoff, or None"""
+        raise NotImplementedError
+
+    def stop(self, timeout=10.0):
+        """Stop the flush loop and write out whatever is still pending"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.flush()
+
+    def _queue_stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+            oldest = min((state["marked_at"] for state in self._dirty.values()), default=None)
+        return pending, {
+            "oldest_pending_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+            "flushes": self.flushes,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "backoff_seconds": self.backoff
+        }
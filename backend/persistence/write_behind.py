@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def replace_payload(old_payload, new_payload):
+    """Default coalescing rule: the newest snapshot wins"""
+    return new_payload
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WriteBehindQueue:
+    """
+    Background persistence with per-key coalescing.
+
+    submit() records the payload in a SQLite spool (so pending writes survive a
+    restart) and returns immediately. Worker threads call handler(key, payload)
+    later. If a key is submitted again before a worker picks it up, the payloads
+    are merged with merge(old, new) and only one write happens. A key is never
+    handled by two workers at once, so updates to one session stay in order.
+
+    Every spool row is owned by the process that wrote it and is deleted only
+    after the write it holds has completed, so a payload being written stays
+    spooled until then. On start a process takes over rows whose owner
+    process has died; rows of live processes sharing the file are left
+    alone. Delivery is at-least-once, so handlers must be idempotent.
+    """
+
+    def __init__(self, handler, spool_path, workers=2, max_pending=1000, max_attempts=3, merge=replace_payload, name="write-behind"):
+        self.handler = handler
+        self.merge = merge
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # key -> {"payload", "seqs", "enqueued_at"}
+        self._in_progress = set()
+        self._accepting = True
+        self._stopped = False
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.recovered = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(spool_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, payload TEXT NOT NULL, enqueued_at REAL NOT NULL, owner TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS spool_owner ON spool (owner)")
+        self._recover()
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"{name}-{i + 1}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _claim_orphans(self):
+        """Take over spool rows left by processes on this host that are no longer running"""
+        host = socket.gethostname()
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Rows from the single-row-per-key spool format, if an old file is still around
+                if self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pending'").fetchone():
+                    self._db.execute(
+                        "INSERT INTO spool (key, payload, enqueued_at, owner) SELECT key, payload, enqueued_at, ? FROM pending ORDER BY seq",
+                        (self.owner,)
+                    )
+                    self._db.execute("DROP TABLE pending")
+                for (owner,) in self._db.execute("SELECT DISTINCT owner FROM spool WHERE owner != ?", (self.owner,)).fetchall():
+                    owner_host, _, pid = owner.rpartition(":")
+                    if owner_host == host and pid.isdigit() and not _process_alive(int(pid)):
+                        self._db.execute("UPDATE spool SET owner = ? WHERE owner = ?", (self.owner, owner))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _recover(self):
+        """Reload writes that were still pending (or being written) when their process stopped"""
+        self._claim_orphans()
+        with self._db_lock:
+            rows = self._db.execute("SELECT seq, key, payload, enqueued_at FROM spool WHERE owner = ? ORDER BY seq", (self.owner,)).fetchall()
+        for seq, key, payload, enqueued_at in rows:
+            payload = json.loads(payload)
+            existing = self._pending.get(key)
+            if existing:
+                # Replay in submission order; rows for one key collapse into one write that clears them all
+                existing["payload"] = self.merge(existing["payload"], payload)
+                existing["seqs"].append(seq)
+            else:
+                self._pending[key] = {"payload": payload, "seqs": [seq], "enqueued_at": enqueued_at}
+        self.recovered = len(rows)
+        if rows:
+            print(f"♻️  {self.name}: recovered {len(rows)} pending write(s) from spool")
+
+    def submit(self, key, payload, timeout=1.0):
+        """Queue a write for key. Returns False if the queue is full or shutting down; the caller should then write inline."""
+        with self._cond:
+            if not self._accepting:
+                self.rejected += 1
+                return False
+            if key not in self._pending:
+                deadline = time.time() + timeout
+                while len(self._pending) >= self.max_pending:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        self.rejected += 1
+                        print(f"⚠️  {self.name}: queue full ({len(self._pending)} pending) - rejecting {key}")
+                        return False
+
+            existing = self._pending.get(key)
+            if existing:
+                payload = self.merge(existing["payload"], payload)
+                enqueued_at = existing["enqueued_at"]
+                self.coalesced += 1
+            else:
+                enqueued_at = time.time()
+            # The merged payload supersedes the queued (not in-flight) rows for this key
+            seq = self._spool(key, payload, enqueued_at, replaces=existing["seqs"] if existing else [])
+            self._pending[key] = {"payload": payload, "seqs": [seq], "enqueued_at": enqueued_at}
+            self.submitted += 1
+            self._cond.notify()
+            return True
+
+    def _spool(self, key, payload, enqueued_at, replaces=()):
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                seq = self._db.execute(
+                    "INSERT INTO spool (key, payload, enqueued_at, owner) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(payload, default=str), enqueued_at, self.owner)
+                ).lastrowid
+                if replaces:
+                    self._db.executemany("DELETE FROM spool WHERE seq = ?", [(old_seq,) for old_seq in replaces])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return seq
+
+    def _unspool(self, seqs):
+        # Only the rows this write covered; anything submitted while it ran has its own row
+        with self._db_lock:
+            self._db.executemany("DELETE FROM spool WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def _next_item(self):
+        """Oldest pending key that no other worker is currently writing"""
+        for key in self._pending:
+            if key not in self._in_progress:
+                return key, self._pending.pop(key)
+        return None, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                key, item = self._next_item()
+                while key is None:
+                    if self._stopped:
+                        return
+                    self._cond.wait()
+                    key, item = self._next_item()
+                self._in_progress.add(key)
+                self._cond.notify_all()  # a slot freed up for blocked submitters
+
+            try:
+                self._handle(key, item)
+            finally:
+                with self._cond:
+                    self._in_progress.discard(key)
+                    self._cond.notify_all()
+
+    def _handle(self, key, item):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.handler(key, item["payload"])
+                lag = time.time() - item["enqueued_at"]
+                self.processed += 1
+                self.last_lag_seconds = lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+                self._unspool(item["seqs"])
+                return
+            except Exception as e:
+                print(f"⚠️  {self.name}: write for {key} failed (attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt < self.max_attempts:
+                    time.sleep(min(2 ** attempt, 10))
+        self.failed += 1
+        # Left in the spool: it is retried when this spool is next recovered
+        print(f"❌ {self.name}: giving up on write for {key} for now (kept in spool)")
+
+    def stats(self):
+        with self._cond:
+            now = time.time()
+            oldest = min((item["enqueued_at"] for item in self._pending.values()), default=None)
+            return {
+                "depth": len(self._pending),
+                "in_progress": len(self._in_progress),
+                "max_pending": self.max_pending,
+                "oldest_pending_seconds": round(now - oldest, 3) if oldest else 0.0,
+                "last_lag_seconds": round(self.last_lag_seconds, 3),
+                "max_lag_seconds": round(self.max_lag_seconds, 3),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "recovered": self.recovered
+            }
+
+    def shutdown(self, timeout=10.0):
+        """Stop accepting writes and drain what is queued; anything left stays in the spool for next start"""
+        with self._cond:
+            self._accepting = False
+            deadline = time.time() + timeout
+            while self._pending or self._in_progress:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    print(f"⚠️  {self.name}: drain timed out with {len(self._pending)} pending write(s) left in spool")
+                    break
+                self._cond.wait(remaining)
+            self._stopped = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(timeout=1.0)
+        print(f"✅ {self.name}: drained ({self.processed} writes processed)")
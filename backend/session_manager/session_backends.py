@@ -0,0 +1,297 @@
+import json
+import time
+import random
+import sqlite3
+import threading
+from session_manager.session_store import SessionStore, new_session
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class VersionConflict(Exception):
+    """The session was changed by another worker since it was loaded"""
+
+
+class SQLiteSessionBackend:
+    """
+    Sessions shared by every worker process on one host, in a SQLite file (WAL mode).
+
+    Each row carries a version number; save() only succeeds if the row still
+    has the version the caller loaded, otherwise it raises VersionConflict.
+    """
+
+    def __init__(self, path="sessions.sqlite3"):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        db.commit()
+
+    def _db(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def load(self, session_id):
+        row = self._db().execute("SELECT data, version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def save(self, session_id, session, expected_version):
+        db = self._db()
+        data = json.dumps(session, default=str)
+        now = time.time()
+        with db:
+            if expected_version == 0:
+                try:
+                    db.execute(
+                        "INSERT INTO sessions (session_id, data, version, updated_at) VALUES (?, ?, 1, ?)",
+                        (session_id, data, now)
+                    )
+                except sqlite3.IntegrityError:
+                    raise VersionConflict(session_id)
+                return 1
+            cursor = db.execute(
+                "UPDATE sessions SET data = ?, version = version + 1, updated_at = ? WHERE session_id = ? AND version = ?",
+                (data, now, session_id, expected_version)
+            )
+            if cursor.rowcount == 0:
+                raise VersionConflict(session_id)
+        return expected_version + 1
+
+    def purge_idle(self, idle_ttl):
+        """Remove sessions not written for idle_ttl seconds; returns [(session_id, session)]"""
+        db = self._db()
+        rows = db.execute(
+            "SELECT session_id, data, version FROM sessions WHERE updated_at < ?", (time.time() - idle_ttl,)
+        ).fetchall()
+        purged = []
+        with db:
+            for session_id, data, version in rows:
+                # Skip rows another worker touched since the SELECT
+                if db.execute("DELETE FROM sessions WHERE session_id = ? AND version = ?", (session_id, version)).rowcount:
+                    purged.append((session_id, json.loads(data)))
+        return purged
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class RedisSessionBackend:
+    """
+    Sessions shared across hosts in Redis (or any Redis-protocol server).
+
+    Versions are checked with WATCH/MULTI. Every save also records the
+    session in a sorted set by write time, which purge_idle() sweeps so idle
+    sessions are handed to on_evict before they are removed. Key TTLs (twice
+    idle_ttl) only clean up after workers that stopped sweeping. Pass
+    client= to use a stand-in such as fakeredis.
+    """
+
+    def __init__(self, url=None, idle_ttl=1800, prefix="session:", client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SESSION_BACKEND=redis requires the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.idle_ttl = int(idle_ttl)
+        self.prefix = prefix
+        self.index_key = f"{prefix}__idle_index__"
+
+    def _key(self, session_id):
+        return f"{self.prefix}{session_id}"
+
+    def load(self, session_id):
+        data, version = self.client.hmget(self._key(session_id), "data", "version")
+        return (json.loads(data), int(version)) if data else (None, 0)
+
+    def save(self, session_id, session, expected_version):
+        key = self._key(session_id)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, "version")
+                if int(current or 0) != expected_version:
+                    raise VersionConflict(session_id)
+                pipe.multi()
+                pipe.hset(key, mapping={"data": json.dumps(session, default=str), "version": expected_version + 1})
+                pipe.expire(key, self.idle_ttl * 2)
+                pipe.zadd(self.index_key, {session_id: time.time()})
+                pipe.execute()
+            except redis.WatchError:
+                raise VersionConflict(session_id)
+        return expected_version + 1
+
+    def purge_idle(self, idle_ttl):
+        """Remove sessions not written for idle_ttl seconds; returns [(session_id, session)]"""
+        purged = []
+        idle = self.client.zrangebyscore(self.index_key, 0, time.time() - idle_ttl, start=0, num=500)
+        for session_id in idle:
+            session_id = session_id.decode() if isinstance(session_id, bytes) else session_id
+            key = self._key(session_id)
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    data = pipe.hget(key, "data")
+                    score = pipe.zscore(self.index_key, session_id)
+                    if score is None or score >= time.time() - idle_ttl:
+                        continue  # written again, or purged by another worker, since the range read
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.zrem(self.index_key, session_id)
+                    pipe.execute()
+                except redis.WatchError:
+                    continue
+            if data:
+                purged.append((session_id, json.loads(data)))
+        return purged
+
+    def count(self):
+        return self.client.zcard(self.index_key)
+
+
+class SharedSessionStore:
+    """
+    Session store backed by a shared backend, with the same interface as SessionStore.
+
+    update(session_id, fn) is optimistic: load the session and its version,
+    apply fn, and save only if nobody else saved in between; on
+    VersionConflict it reloads and re-applies fn (so fn must only depend on
+    the session it is given). Sessions not in the backend are rehydrated with
+    loader(session_id). Idle sessions are purged every purge_interval seconds
+    and handed to on_evict.
+    """
+
+    def __init__(self, backend, idle_ttl=1800, loader=None, on_evict=None, max_retries=5, purge_interval=60):
+        self.backend = backend
+        self.idle_ttl = idle_ttl
+        self.loader = loader
+        self.on_evict = on_evict
+        self.max_retries = max_retries
+        self.purge_interval = purge_interval
+        self._last_purge = time.time()
+        self._purge_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.rehydrated = 0
+        self.expired = 0
+        self.conflicts = 0
+
+    def _load(self, session_id):
+        session, version = self.backend.load(session_id)
+        if session is not None:
+            self.hits += 1
+            return session, version
+        self.misses += 1
+        if self.loader:
+            try:
+                session = self.loader(session_id)
+            except Exception as e:
+                print(f"⚠️  Failed to rehydrate session {session_id}: {e}")
+                session = None
+            if session is not None:
+                self.rehydrated += 1
+                print(f"♻️  Session {session_id} rehydrated from database ({len(session.get('messages', []))} messages)")
+        return session, 0
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.purge_interval or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_purge = now
+            purged = self.backend.purge_idle(self.idle_ttl)
+            self.expired += len(purged)
+            for session_id, session in purged:
+                if self.on_evict:
+                    try:
+                        self.on_evict(session_id, session)
+                    except Exception as e:
+                        print(f"⚠️  Failed to flush evicted session {session_id}: {e}")
+        except Exception as e:
+            print(f"⚠️  Session purge failed: {e}")
+        finally:
+            self._purge_lock.release()
+
+    def get(self, session_id):
+        self._maybe_purge()
+        session, _ = self._load(session_id)
+        return session
+
+    def get_or_create(self, session_id, email=""):
+        return self.update(session_id, lambda session: session, email=email)
+
+    def update(self, session_id, fn, email=""):
+        """Apply fn(session) to the session (created if missing) and return fn's result"""
+        self._maybe_purge()
+        for attempt in range(self.max_retries + 1):
+            session, version = self._load(session_id)
+            if session is None:
+                session = new_session(email)
+            result = fn(session)
+            try:
+                self.backend.save(session_id, session, version)
+                return result
+            except VersionConflict:
+                self.conflicts += 1
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, 0.01 * (2 ** attempt)))
+
+    def __contains__(self, session_id):
+        return self.backend.load(session_id)[0] is not None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        try:
+            size = self.backend.count()
+        except Exception:
+            size = None
+        return {
+            "backend": type(self.backend).__name__,
+            "size": size,
+            "idle_ttl_seconds": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rehydrated": self.rehydrated,
+            "expired": self.expired,
+            "version_conflicts": self.conflicts,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_session_store(config, loader=None, on_evict=None):
+    """Build the session store selected by SESSION_BACKEND: memory (per process), sqlite (per host) or redis (shared)"""
+    backend = config['backend']
+    if backend == "memory":
+        return SessionStore(
+            max_sessions=config['max_sessions'],
+            idle_ttl=config['idle_ttl'],
+            loader=loader,
+            on_evict=on_evict
+        )
+    if backend == "sqlite":
+        shared = SQLiteSessionBackend(config['sqlite_path'])
+    elif backend == "redis":
+        shared = RedisSessionBackend(config['redis_url'], idle_ttl=config['idle_ttl'])
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    print(f"✅ Using shared session backend: {backend}")
+    return SharedSessionStore(
+        shared,
+        idle_ttl=config['idle_ttl'],
+        loader=loader,
+        on_evict=on_evict,
+        max_retries=config['max_retries']
+    )
@@ -1,3 +1,5 @@
+import re
+import threading
 from datetime import datetime
 from environment import get_google_credentials, get_hubspot_config, get_dropbox_config,get_flask_config, get_mongodb_uri
 from chatbot.chatbot import build_conversation_text
@@ -6,6 +8,7 @@ import gspread
 
 # Google Sheets configuration
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+CELL_MAX_LENGTH = 50000  # Sheets rejects any cell longer than this
 
 # Initialize Google Sheets client
 sheets_client = None
@@ -33,6 +36,61 @@ except Exception as e:
     print(f"⚠️  Google Sheets connection failed: {e}")
     worksheet = None
 
+# session_id -> 1-based sheet row, built once from column A and kept current on append
+_row_index = {}
+_row_index_built = False
+_row_index_lock = threading.Lock()
+
+def _build_row_index():
+    """Scan only the session id column; called once, and again only when a cached row turns out to be wrong"""
+    global _row_index_built
+    session_ids = worksheet.col_values(1)
+    _row_index.clear()
+    for i, value in enumerate(session_ids):
+        if value:
+            _row_index[value] = i + 1
+    _row_index_built = True
+    print(f"📇 Google Sheets row index built: {len(_row_index)} sessions")
+
+def get_session_row(session_id, rebuild=False):
+    with _row_index_lock:
+        if rebuild or not _row_index_built:
+            _build_row_index()
+        return _row_index.get(session_id)
+
+def remember_appended_rows(session_ids, append_response):
+    """Record the rows Sheets reports for an append (updatedRange like 'Sheet1!A42:F44'), in order"""
+    global _row_index_built
+    try:
+        updated_range = append_response["updates"]["updatedRange"]
+        first_row = int(re.search(r"![A-Z]+(\d+)", updated_range).group(1))
+        with _row_index_lock:
+            for offset, session_id in enumerate(session_ids):
+                _row_index[session_id] = first_row + offset
+    except Exception:
+        # Unknown rows: force a rescan on the next lookup rather than risk duplicate rows
+        with _row_index_lock:
+            _row_index_built = False
+
+def _append_session_row(session_id, row):
+    response = worksheet.append_row(row)
+    remember_appended_rows([session_id], response)
+
+def fit_cell(text):
+    """Trim a conversation to the Sheets cell limit, keeping the most recent part"""
+    return text if len(text) <= CELL_MAX_LENGTH else text[-CELL_MAX_LENGTH:]
+
+def build_session_row(session_id, email, chat_history):
+    """Sheet row for a session's current state: id, email, timestamp, message count, conversation, status"""
+    return [
+        session_id,
+        email,
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        len(chat_history),
+        fit_cell(build_conversation_text(chat_history, session_id).strip()),
+        "active"
+    ]
+
 def save_session_to_sheets(session_id, email, chat_history, update_existing=False):
     """Save session data to Google Sheets - one row per session with full conversation"""
     if not GOOGLE_SHEETS_ENABLED:
@@ -51,7 +109,7 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
             "email": email,
             "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             "message_count": len(chat_history),
-            "conversation": conversation_text.strip(),
+            "conversation": fit_cell(conversation_text.strip()),
             "status": "active"
         }
 
@@ -64,17 +122,20 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
             session_data["status"]
         ]
 
-        if session_id in saved_sessions and update_existing:
+        # The row index knows whether this session already has a row, even after a restart,
+        # so update_existing is only a hint from the caller
+        session_row = get_session_row(session_id)
 
-            try:
+        if session_row:
 
-                all_values = worksheet.get_all_values()
-                session_row = None
+            try:
 
-                for i, row_data in enumerate(all_values):
-                    if row_data and len(row_data) > 0 and row_data[0] == session_id:
-                        session_row = i + 1
-                        break
+                # Read just this row: confirms the cached position and gives the existing conversation
+                row_data = worksheet.row_values(session_row)
+                if not row_data or row_data[0] != session_id:
+                    print(f"⚠️  Cached row {session_row} no longer holds session {session_id} - rescanning")
+                    session_row = get_session_row(session_id, rebuild=True)
+                    row_data = worksheet.row_values(session_row) if session_row else []
 
                 if session_row:
 
@@ -82,10 +143,6 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
                     if len(row_data) > 4:
                         existing_conversation = row_data[4] if row_data[4] else ""
 
-                    updated_conversation = existing_conversation
-                    if existing_conversation:
-                        updated_conversation += "\n\n--- New Messages ---\n"
-
                     existing_count = int(row_data[3]) if len(row_data) > 3 and row_data[3].isdigit() else 0
                     new_messages = chat_history[existing_count:]
 
@@ -115,7 +172,7 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
                         session_data["email"],
                         session_data["timestamp"],
                         session_data["message_count"],
-                        updated_conversation,
+                        fit_cell(updated_conversation),
                         session_data["status"]
                     ]
 
@@ -126,23 +183,20 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
                 else:
                     print(f"⚠️  Session {session_id} not found in sheet, appending new row")
 
-                    worksheet.append_row(row)
-                    saved_sessions.add(session_id)
+                    _append_session_row(session_id, row)
                     print(f"✅ Session {session_id} appended to Google Sheets")
                     return True
 
             except Exception as update_error:
                 print(f"⚠️  Failed to update existing row: {update_error}")
 
-                worksheet.append_row(row)
-                saved_sessions.add(session_id)
+                _append_session_row(session_id, row)
                 print(f"✅ Session {session_id} appended to Google Sheets (fallback)")
                 return True
         else:
 
             try:
-                worksheet.append_row(row)
-                saved_sessions.add(session_id)
+                _append_session_row(session_id, row)
                 print(f"✅ Session {session_id} saved to Google Sheets (one row with full conversation)")
                 return True
             except Exception as sheet_error:
@@ -151,4 +205,4 @@ def save_session_to_sheets(session_id, email, chat_history, update_existing=Fals
 
     except Exception as e:
         print(f"⚠️  Google Sheets save failed: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,151 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+def new_session(email=""):
+    """Default state for a chat session"""
+    return {
+        "messages": [],
+        "context_history": [],
+        "conversation_state": "initial",
+        "customer_info": {},
+        "email": email,
+        "logos": [],
+        "unsaved_turns": []
+    }
+
+
+class SessionStore:
+    """
+    Bounded in-memory store for chat sessions.
+
+    Holds at most max_sessions sessions in LRU order; sessions idle for longer
+    than idle_ttl seconds, or pushed out by the cap, are handed to
+    on_evict(session_id, session) and dropped from memory. A session that is
+    not in memory is rehydrated lazily with loader(session_id), which returns
+    a session dict or None.
+
+    Mutations go through update(session_id, fn), where fn changes the session
+    dict in place; get() results should be treated as read-only.
+    """
+
+    def __init__(self, max_sessions=1000, idle_ttl=1800, loader=None, on_evict=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.loader = loader
+        self.on_evict = on_evict
+
+        self._lock = threading.RLock()
+        self._sessions = OrderedDict()  # session_id -> {"session", "last_access"}
+
+        self.hits = 0
+        self.misses = 0
+        self.rehydrated = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _evict_locked(self, now):
+        """Pop idle and over-cap sessions (oldest first); returns them for on_evict"""
+        evicted = []
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            idle = now - entry["last_access"] >= self.idle_ttl
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            if idle:
+                self.expired += 1
+            else:
+                self.evictions += 1
+            evicted.append((session_id, entry["session"]))
+        return evicted
+
+    def _flush_evicted(self, evicted):
+        if not self.on_evict:
+            return
+        for session_id, session in evicted:
+            try:
+                self.on_evict(session_id, session)
+            except Exception as e:
+                print(f"⚠️  Failed to flush evicted session {session_id}: {e}")
+
+    def _load(self, session_id):
+        if not self.loader:
+            return None
+        try:
+            return self.loader(session_id)
+        except Exception as e:
+            print(f"⚠️  Failed to rehydrate session {session_id}: {e}")
+            return None
+
+    def _lookup(self, session_id, create, email=""):
+        """Return the in-memory session, rehydrating or creating it if asked; caller holds no lock"""
+        with self._lock:
+            now = time.time()
+            entry = self._sessions.get(session_id)
+            if entry:
+                self.hits += 1
+                entry["last_access"] = now
+                self._sessions.move_to_end(session_id)
+                return entry["session"], []
+            self.misses += 1
+
+        # Rehydrate outside the lock so a slow database doesn't block other sessions
+        session = self._load(session_id)
+        with self._lock:
+            now = time.time()
+            entry = self._sessions.get(session_id)
+            if entry:
+                # Another request loaded it meanwhile
+                entry["last_access"] = now
+                self._sessions.move_to_end(session_id)
+                return entry["session"], []
+            if session is not None:
+                self.rehydrated += 1
+                print(f"♻️  Session {session_id} rehydrated from database ({len(session.get('messages', []))} messages)")
+            elif create:
+                session = new_session(email)
+            else:
+                return None, []
+            self._sessions[session_id] = {"session": session, "last_access": now}
+            return session, self._evict_locked(now)
+
+    def get(self, session_id):
+        session, evicted = self._lookup(session_id, create=False)
+        self._flush_evicted(evicted)
+        return session
+
+    def get_or_create(self, session_id, email=""):
+        session, evicted = self._lookup(session_id, create=True, email=email)
+        self._flush_evicted(evicted)
+        return session
+
+    def update(self, session_id, fn, email=""):
+        """Apply fn(session) to the session (created if missing) and return fn's result"""
+        session, evicted = self._lookup(session_id, create=True, email=email)
+        try:
+            with self._lock:
+                return fn(session)
+        finally:
+            self._flush_evicted(evicted)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "size": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rehydrated": self.rehydrated,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,114 @@
+from environment import get_sheets_sync_config
+from session_manager import session_manager as sheets
+from persistence.dirty_sync import DirtySetSync, is_transient
+
+
+class SheetsSyncEngine(DirtySetSync):
+    """
+    Coalescing batch writer for the sessions sheet.
+
+    Chat turns only mark a session dirty. Every flush_interval seconds the
+    latest state of every dirty session is written with one batch_update (for
+    sessions that already have a row) and one append_rows (for new sessions),
+    instead of one update/append call per message. Rate-limit (429),
+    server and network errors put the batch back and back off
+    exponentially. Any other error is about the data, so the rows are retried
+    one at a time and a session that keeps failing is dropped (see
+    DirtySetSync) instead of blocking everyone else.
+    """
+
+    label = "Google Sheets"
+
+    def __init__(self, flush_interval=5.0, max_backoff=300.0):
+        super().__init__(flush_interval, max_backoff=max_backoff)
+        self.rows_updated = 0
+        self.rows_appended = 0
+        self.rate_limited = 0
+
+    def start(self):
+        return super().start("sheets-sync")
+
+    def mark_dirty(self, session_id, email, chat_history):
+        self.mark(session_id, {"email": email, "messages": list(chat_history)})
+
+    def _back_off(self, error):
+        self.rate_limited += 1
+        super()._back_off(error)
+
+    def _send(self, batch):
+        if not sheets.worksheet:
+            return None
+
+        try:
+            self._write(batch)
+        except Exception as e:
+            if is_transient(e):
+                self._back_off(e)
+                return batch
+            # One bad row fails the whole batch; find it by writing the rows one at a time
+            self.errors += 1
+            print(f"⚠️  Google Sheets flush failed ({e}); writing rows one by one")
+            session_ids = list(batch)
+            for i, session_id in enumerate(session_ids):
+                try:
+                    self._write({session_id: batch[session_id]})
+                except Exception as row_error:
+                    if is_transient(row_error):
+                        self._back_off(row_error)
+                        return {sid: batch[sid] for sid in session_ids[i:]}
+                    self.errors += 1
+                    self._retry_later({session_id: batch[session_id]}, row_error)
+        return None
+
+    def _write(self, batch):
+        rows = {session_id: sheets.build_session_row(session_id, state["email"], state["messages"])
+                for session_id, state in batch.items()}
+        known = {session_id: sheets.get_session_row(session_id) for session_id in rows}
+
+        # One read confirms every cached row still belongs to its session
+        existing = {sid: row for sid, row in known.items() if row}
+        if existing and not self._rows_still_match(existing):
+            known = {session_id: sheets.get_session_row(session_id, rebuild=(i == 0))
+                     for i, session_id in enumerate(rows)}
+
+        updates = [
+            {"range": f"A{known[sid]}:F{known[sid]}", "values": [rows[sid]]}
+            for sid in rows if known[sid]
+        ]
+        new_sessions = [sid for sid in rows if not known[sid]]
+
+        if updates:
+            sheets.worksheet.batch_update(updates)
+            self.rows_updated += len(updates)
+        if new_sessions:
+            response = sheets.worksheet.append_rows([rows[sid] for sid in new_sessions])
+            sheets.remember_appended_rows(new_sessions, response)
+            self.rows_appended += len(new_sessions)
+
+        print(f"✅ Google Sheets flush: {len(updates)} updated, {len(new_sessions)} appended")
+
+    def _rows_still_match(self, existing):
+        ranges = [f"A{row}" for row in existing.values()]
+        values = sheets.worksheet.batch_get(ranges)
+        for session_id, cell in zip(existing, values):
+            current = cell[0][0] if cell and cell[0] else None
+            if current != session_id:
+                print(f"⚠️  Cached row for session {session_id} is stale - rescanning")
+                return False
+        return True
+
+    def stats(self):
+        pending, stats = self._queue_stats()
+        return {
+            "pending_rows": pending,
+            **stats,
+            "rows_updated": self.rows_updated,
+            "rows_appended": self.rows_appended,
+            "rate_limited": self.rate_limited
+        }
+
+sheets_sync_config = get_sheets_sync_config()
+sheets_sync_engine = SheetsSyncEngine(
+    flush_interval=sheets_sync_config['flush_interval'],
+    max_backoff=sheets_sync_config['max_backoff']
+).start() if sheets_sync_config['enabled'] and sheets.GOOGLE_SHEETS_ENABLED else None
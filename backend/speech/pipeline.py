@@ -0,0 +1,92 @@
+import io
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from environment import get_speech_config
+
+# A sentence ends at . ! or ? followed by whitespace, or at a line break
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+# Read once at import; synthesize_sentence runs for every sentence of every answer
+speech_config = get_speech_config()
+
+
+class SentenceSplitter:
+    """Turns a stream of text deltas into complete sentences as soon as each one ends"""
+
+    def __init__(self, min_chars=20):
+        # Very short fragments ("Sure!") are merged into the next sentence to avoid tiny TTS requests
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def transcribe_audio(client, audio, filename="audio.webm"):
+    """Run Whisper on an in-memory buffer; the filename only tells the API which container format it is"""
+    buffer = io.BytesIO(audio)
+    buffer.name = filename
+    transcript = client.audio.transcriptions.create(model="whisper-1", file=buffer)
+    return transcript.text.strip()
+
+
+def synthesize_sentence(client, text, model=None, voice=None):
+    """Synthesize one sentence to MP3 bytes, kept in memory"""
+    with client.audio.speech.with_streaming_response.create(
+        model=model or speech_config['tts_model'],
+        voice=voice or speech_config['voice'],
+        input=text,
+        response_format="mp3"
+    ) as response:
+        return b"".join(response.iter_bytes())
+
+
+def pipelined_speech(client, text_stream, max_in_flight=None, min_sentence_chars=None):
+    """
+    Yield MP3 segments, one per sentence, in order, while the answer is still being generated.
+
+    Each sentence is sent to TTS as soon as it is complete, with at most
+    max_in_flight TTS requests running at once. MP3 frames are
+    self-delimiting, so the segments can be played back-to-back or
+    concatenated into a single stream.
+    """
+    max_in_flight = max_in_flight or speech_config['max_tts_in_flight']
+    splitter = SentenceSplitter(min_sentence_chars or speech_config['min_sentence_chars'])
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        def submit(sentences):
+            for sentence in sentences:
+                while len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().result()
+                in_flight.append(executor.submit(
+                    synthesize_sentence, client, sentence, speech_config['tts_model'], speech_config['voice']
+                ))
+
+        try:
+            for delta in text_stream:
+                yield from submit(splitter.feed(delta))
+                # Hand over finished audio without waiting for the rest of the answer
+                while in_flight and in_flight[0].done():
+                    yield in_flight.popleft().result()
+            yield from submit(splitter.flush())
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            # Consumer went away (or an error occurred): don't start queued sentences
+            for future in in_flight:
+                future.cancel()
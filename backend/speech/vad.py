@@ -0,0 +1,139 @@
+import io
+import wave
+from collections import deque
+import numpy as np
+from environment import get_vad_config
+
+
+def frame_features(frame):
+    """RMS energy and zero-crossing rate of one int16 frame"""
+    samples = frame.astype(np.float32)
+    rms = float(np.sqrt(np.mean(samples * samples)))
+    signs = np.signbit(frame)
+    zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / max(1, len(frame) - 1)
+    return rms, zcr
+
+
+def pcm_to_wav(pcm, sample_rate):
+    """Wrap raw 16-bit mono PCM in a WAV container, in memory, so Whisper can read it"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class UtteranceAssembler:
+    """
+    Buffers streamed 16-bit mono PCM for one connection and cuts it into utterances.
+
+    A frame counts as speech when its RMS energy clears both an absolute floor
+    and snr_ratio times the running noise estimate, and its zero-crossing rate
+    is low enough to rule out hiss. Speech starts after start_frames speech
+    frames in a row (plus pre_roll_ms of lead-in), and ends after hangover_ms
+    of non-speech or at max_utterance_ms. Utterances with less than
+    min_speech_ms of speech are dropped as clicks or coughs.
+    """
+
+    def __init__(self, **overrides):
+        config = get_vad_config()
+        config.update(overrides)
+        self.sample_rate = config['sample_rate']
+        self.frame_samples = self.sample_rate * config['frame_ms'] // 1000
+        self.min_rms = config['min_rms']
+        self.snr_ratio = config['snr_ratio']
+        self.max_zcr = config['max_zcr']
+        self.start_frames = config['start_frames']
+        self.hangover_frames = max(1, config['hangover_ms'] // config['frame_ms'])
+        self.min_speech_frames = max(1, config['min_speech_ms'] // config['frame_ms'])
+        self.max_utterance_frames = max(1, config['max_utterance_ms'] // config['frame_ms'])
+
+        self.noise_rms = None
+        self._leftover = b""
+        self._pre_roll = deque(maxlen=max(self.start_frames, config['pre_roll_ms'] // config['frame_ms']))
+        self._frames = []
+        self._in_speech = False
+        self._speech_run = 0
+        self._speech_frames = 0
+        self._silence_run = 0
+
+        self.utterances = 0
+        self.dropped = 0
+
+    def is_speech(self, frame):
+        rms, zcr = frame_features(frame)
+        threshold = max(self.min_rms, (self.noise_rms or 0.0) * self.snr_ratio)
+        speech = rms >= threshold and zcr <= self.max_zcr
+        if not speech:
+            # Track the background level from non-speech frames only
+            self.noise_rms = rms if self.noise_rms is None else 0.95 * self.noise_rms + 0.05 * rms
+        return speech
+
+    def feed(self, pcm):
+        """Add raw PCM bytes; returns a list of completed utterances (PCM bytes)"""
+        data = self._leftover + pcm
+        frame_bytes = self.frame_samples * 2
+        usable = len(data) - len(data) % frame_bytes
+        self._leftover = data[usable:]
+
+        completed = []
+        samples = np.frombuffer(data[:usable], dtype="<i2")
+        for start in range(0, len(samples), self.frame_samples):
+            utterance = self._process_frame(samples[start:start + self.frame_samples])
+            if utterance:
+                completed.append(utterance)
+        return completed
+
+    def _process_frame(self, frame):
+        speech = self.is_speech(frame)
+        raw = frame.tobytes()
+
+        if not self._in_speech:
+            self._pre_roll.append(raw)
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.start_frames:
+                self._in_speech = True
+                self._frames = list(self._pre_roll)
+                self._speech_frames = self._speech_run
+                self._silence_run = 0
+                self._pre_roll.clear()
+            return None
+
+        self._frames.append(raw)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+
+        if self._silence_run >= self.hangover_frames or len(self._frames) >= self.max_utterance_frames:
+            return self._finish()
+        return None
+
+    def _finish(self):
+        # Keep a little trailing silence so words aren't clipped, but not the whole hangover
+        trailing = max(0, self._silence_run - 3)
+        frames = self._frames[:len(self._frames) - trailing] if trailing else self._frames
+        speech_frames = self._speech_frames
+        self._frames = []
+        self._in_speech = False
+        self._speech_run = 0
+        self._speech_frames = 0
+        self._silence_run = 0
+
+        if speech_frames < self.min_speech_frames:
+            self.dropped += 1
+            return None
+        self.utterances += 1
+        return b"".join(frames)
+
+    def flush(self):
+        """End of stream: return whatever utterance is in progress"""
+        self._leftover = b""
+        self._pre_roll.clear()
+        if not self._in_speech:
+            return []
+        utterance = self._finish()
+        return [utterance] if utterance else []
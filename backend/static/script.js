@@ -336,7 +336,12 @@ async function uploadLogoFile(file) {
             body: formData
         });
         
-        const data = await response.json();
+        let data = await response.json();
+        
+        // The upload continues in the background; wait for the Dropbox link
+        if (data.success && data.job_id && data.status !== 'done') {
+            data = await pollLogoUpload(logoId, data.status_url);
+        }
         
         if (data.success) {
             updateLogoPreviewItem(logoId, 'success', data.dropbox_url);
@@ -357,6 +362,26 @@ async function uploadLogoFile(file) {
     }
 }
 
+async function pollLogoUpload(logoId, statusUrl) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+        
+        if (!response.ok || job.status === 'done' || job.status === 'failed') {
+            if (job.error) {
+                job.message = job.error;
+            }
+            return job;
+        }
+        
+        const progressBar = document.querySelector(`#${logoId} .logo-upload-progress-bar`);
+        if (progressBar) {
+            progressBar.style.width = `${Math.max(10, Math.round(job.progress * 100))}%`;
+        }
+    }
+}
+
 function addLogoPreviewItem(logoId, file, status) {
     const previewItem = document.createElement('div');
     previewItem.className = 'logo-preview-item';
@@ -503,7 +528,7 @@ async function sendMessageToBot(message) {
     isTyping = true;
     
     try {
-        const response = await fetch('/chat', {
+        const response = await fetch('/chat/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -515,28 +540,46 @@ async function sendMessageToBot(message) {
             })
         });
         
-        const data = await response.json();
+        if (!response.ok || !response.body) {
+            throw new Error('Failed to send message');
+        }
         
-        if (response.ok) {
-          
-            addMessage('ai', data.message);
-            
-           
-            if (data.quote_form_triggered && emailCollected) {
-                setTimeout(() => {
-                    showQuoteForm();
-                }, 1000);
-            }
-           
-            if (data.message.toLowerCase().includes('email') && !emailCollected) {
-                showEmailField();
+        let fullText = '';
+        let bubble = null;
+        let result = null;
+        
+        await readServerSentEvents(response, (event, data) => {
+            if (event === 'token') {
+                // First token replaces the typing indicator with a live message bubble
+                if (!bubble) {
+                    bubble = addStreamingMessage();
+                }
+                fullText += data.text;
+                bubble.innerHTML = formatMessage(fullText);
+                scrollToBottom();
+            } else if (event === 'done') {
+                result = data;
+            } else if (event === 'error') {
+                throw new Error(data.message || 'Failed to send message');
             }
-            
-
-          
-          
-        } else {
-            throw new Error(data.message || 'Failed to send message');
+        });
+        
+        if (!result) {
+            throw new Error('Response stream ended unexpectedly');
+        }
+        if (!bubble) {
+            addMessage('ai', fullText);
+        }
+        
+       
+        if (result.quote_form_triggered && emailCollected) {
+            setTimeout(() => {
+                showQuoteForm();
+            }, 1000);
+        }
+       
+        if (fullText.toLowerCase().includes('email') && !emailCollected) {
+            showEmailField();
         }
     } catch (error) {
         console.error('Error:', error);
@@ -547,6 +590,38 @@ async function sendMessageToBot(message) {
     }
 }
 
+// Read a text/event-stream response body, calling onEvent(eventName, parsedData) per event
+async function readServerSentEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (data) {
+                onEvent(eventName, JSON.parse(data));
+            }
+        }
+    }
+}
+
 
 function debugFormFields() {
     console.log('🔍 Debugging form fields...');
@@ -1039,6 +1114,13 @@ function addMessage(sender, content) {
     scrollToBottom();
 }
 
+// Add an empty AI message whose text is filled in while the answer streams; returns the text element
+function addStreamingMessage() {
+    addMessage('ai', '');
+    const bubbles = chatMessages.querySelectorAll('.ai-message .message-bubble p');
+    return bubbles[bubbles.length - 1];
+}
+
 // Format message content (handle links, code blocks, etc.)
 function formatMessage(content) {
     // Convert URLs to clickable links
@@ -1,11 +1,12 @@
-from flask import Flask, request, jsonify, Response
-import os, tempfile
+from flask import Flask, request, jsonify, Response, stream_with_context
+import os
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from openai import OpenAI
 from flask_cors import CORS
 from dotenv import load_dotenv
 import traceback
+from speech.pipeline import pipelined_speech, transcribe_audio, synthesize_sentence, speech_config
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -36,40 +37,24 @@ def transcribe():
 
     audio_file = request.files["audio"]
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-        audio_file.save(tmp.name)
-        tmp_path = tmp.name
-        print("Saved file:", tmp_path, "size:", os.path.getsize(tmp_path))
-
     try:
-        with open(tmp_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f
-            )
-        text = transcript.text
+        text = transcribe_audio(client, audio_file.read(), audio_file.filename or "audio.webm")
         # print(text)
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
-    finally:
-        os.remove(tmp_path)
+
+    if speech_config['pipelined']:
+        # Speak each sentence as soon as the model finishes it
+        tokens = (chunk.content for chunk in chain.stream({ "input" : text }))
+        return Response(stream_with_context(pipelined_speech(client, tokens)), content_type="audio/mpeg")
 
     ### making the RAG
     response = chain.invoke({ "input" : text })
     print(f"👍 {response.content}")
 
-    ### text to speech
-    with client.audio.speech.with_streaming_response.create(
-        model="gpt-4o-mini-tts",
-        voice="alloy",
-        response_format="mp3",
-        input=response.content 
-    ) as response:
-        response.stream_to_file("audio/audio.mp3")
-
-    with open("audio/audio.mp3", "rb") as f:
-        audio_bytes = f.read()
+    ### text to speech (in memory; concurrent requests never share a file)
+    audio_bytes = synthesize_sentence(client, response.content)
 
     return Response(response=audio_bytes, content_type="audio/mpeg")
 
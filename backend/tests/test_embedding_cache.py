@@ -0,0 +1,70 @@
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("dotenv")
+
+from embeddings.embedding_cache import EmbeddingCache, cache_key
+
+DIM = 8
+
+
+def _key(i):
+    return cache_key("test-model", f"text {i}")
+
+
+def _vector(i):
+    return [float(i + d) for d in range(DIM)]
+
+
+def test_reused_slots_stay_usable_across_instances(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    first = EmbeddingCache(path, max_entries=4)
+    for i in range(4):
+        first.put(_key(i), _vector(i))
+
+    # A second worker on the same file evicts everything the first one stored
+    second = EmbeddingCache(path, max_entries=4)
+    for i in range(4, 8):
+        second.put(_key(i), _vector(i))
+
+    for i in range(4):
+        assert first.get(_key(i)) is None
+    # The first worker's slots were reused, not lost: it can keep writing within max_entries
+    for i in range(8, 20):
+        first.put(_key(i), _vector(i))
+        assert first.get(_key(i)) == _vector(i)
+    assert first._slot_count <= 4
+
+
+def _hammer(path, worker, rounds, errors):
+    cache = EmbeddingCache(path, max_entries=16)
+    try:
+        for n in range(rounds):
+            i = (n * 7 + worker) % 64
+            cache.put(_key(i), _vector(i))
+            for j in range(i - 3, i + 1):
+                vector = cache.get(_key(j))
+                if vector is not None and vector != _vector(j):
+                    errors.put(f"worker {worker}: wrong vector for {j}")
+                    return
+    except Exception as e:
+        errors.put(f"worker {worker}: {e!r}")
+
+
+def test_two_processes_share_one_file(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    EmbeddingCache(path, max_entries=16).put(_key(0), _vector(0))
+
+    errors = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_hammer, args=(path, worker, 500, errors)) for worker in range(2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    assert errors.empty(), errors.get()
+    cache = EmbeddingCache(path, max_entries=16)
+    assert cache._slot_count <= 16
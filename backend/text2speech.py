@@ -1,9 +1,10 @@
-from flask import Flask, request, Response, jsonify
+from flask import Flask, request, Response, jsonify, stream_with_context
 from flask_cors import CORS
 from openai import OpenAI
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from chatbot.chatbot import generate_sign_nize_response
+from chatbot.chatbot import generate_sign_nize_response, stream_sign_nize_response, QuoteTriggerFilter
+from speech.pipeline import pipelined_speech, speech_config
 import os
 from dotenv import load_dotenv
 
@@ -26,6 +27,31 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "http://127.0.
 # ])
 # chain = prompt | chat
 
+TTS_CHUNK_SIZE = 4096
+
+def stream_speech(text):
+    """Yield MP3 bytes as they arrive from the TTS provider"""
+    with client.audio.speech.with_streaming_response.create(
+        model="gpt-4o-mini-tts",
+        voice="alloy",      # change to other voices if available
+        input=text,
+        response_format="mp3"
+    ) as response:
+        # If the client disconnects, the server closes this generator and leaving the
+        # with-block closes the upstream connection instead of draining the whole clip
+        for chunk in response.iter_bytes(chunk_size=TTS_CHUNK_SIZE):
+            yield chunk
+
+def stream_answer_speech(text):
+    """Stream the answer and synthesize it sentence by sentence, yielding MP3 segments in order"""
+    def answer_tokens():
+        marker_filter = QuoteTriggerFilter()
+        for delta in stream_sign_nize_response(client, text):
+            yield marker_filter.feed(delta)
+        yield marker_filter.flush()
+
+    return pipelined_speech(client, answer_tokens())
+
 @app.route("/tts", methods=["POST"])
 def text_to_speech():
     try:
@@ -35,25 +61,34 @@ def text_to_speech():
         if not text:
             return jsonify({"error": "No text provided"}), 400
 
-        ### making the RAG
-        # response = chain.invoke({ "input" : text })
-        # print(f"👍 {response.content}")
-        try:
-            response = generate_sign_nize_response(client, text)
-            print(response)
-        except:
-            print("😡 error")
-
-        # Generate speech and stream it directly
-        with client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",      # change to other voices if available
-            input=response, # replacing response.content
-            response_format="mp3"
-        ) as response:
-            audio_bytes = b"".join(response.iter_bytes())
-
-        return Response(audio_bytes, mimetype="audio/mpeg")
+        if data.get("pipelined", speech_config['pipelined']):
+            # Time-to-first-audio is roughly the latency of the first sentence, not the whole answer
+            audio = stream_answer_speech(text)
+        else:
+            ### making the RAG
+            # response = chain.invoke({ "input" : text })
+            # print(f"👍 {response.content}")
+            try:
+                response = generate_sign_nize_response(client, text)
+                print(response)
+            except Exception as e:
+                print("😡 error")
+                return jsonify({"error": f"Failed to generate response: {str(e)}"}), 502
+            audio = stream_speech(response)
+
+        # Pull the first audio frame before answering so provider errors still become a 500
+        first_chunk = next(audio, b"")
+
+        def relay():
+            yield first_chunk
+            yield from audio
+
+        # Send audio to the client as it is synthesized (chunked transfer, no Content-Length)
+        return Response(
+            stream_with_context(relay()),
+            mimetype="audio/mpeg",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,38 +1,89 @@
 // src/components/MicStream.js
 import React, { useState, useRef, useEffect } from "react";
 import { FaMicrophone } from "react-icons/fa";
+import { io } from "socket.io-client";
+
+// Must match VAD_SAMPLE_RATE on the backend
+const SAMPLE_RATE = 16000;
+
+// Convert Web Audio float samples (-1..1) to 16-bit little-endian PCM
+function floatTo16BitPCM(input) {
+  const output = new Int16Array(input.length);
+  for (let i = 0; i < input.length; i++) {
+    const s = Math.max(-1, Math.min(1, input[i]));
+    output[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+  }
+  return output;
+}
 
 export default function MicStream() {
   const [isRecording, setIsRecording] = useState(false);
   const [amplitude, setAmplitude] = useState(0); // for wave animation
-  const mediaRecorderRef = useRef(null);
-  const wsRef = useRef(null);
+  const socketRef = useRef(null);
+  const audioContextRef = useRef(null);
+  const processorRef = useRef(null);
+  const streamRef = useRef(null);
   const analyserRef = useRef(null);
   const animationRef = useRef(null);
+  const playbackQueueRef = useRef([]);
+  const playingRef = useRef(false);
+  // Chunks are numbered so the server can put them back in order
+  const chunkSeqRef = useRef(0);
+
+  // Play answer segments back-to-back in the order they arrive
+  const playNext = () => {
+    const next = playbackQueueRef.current.shift();
+    if (!next) {
+      playingRef.current = false;
+      return;
+    }
+    playingRef.current = true;
+    const url = URL.createObjectURL(new Blob([next], { type: "audio/mpeg" }));
+    const audio = new Audio(url);
+    audio.onended = () => {
+      URL.revokeObjectURL(url);
+      playNext();
+    };
+    audio.play().catch(() => playNext());
+  };
 
   // Start recording & streaming
   const startRecording = async () => {
     try {
-      // connect websocket
-      wsRef.current = new WebSocket("http://127.0.0.1:5000/audio");
-
-      wsRef.current.onopen = () => console.log("✅ Connected to backend");
+      // connect to the Socket.IO backend (kept open between recordings to receive answers)
+      if (!socketRef.current) {
+        socketRef.current = io("http://127.0.0.1:5000");
+        socketRef.current.on("connect", () => {
+          // A (re)connection is a new server-side stream
+          chunkSeqRef.current = 0;
+          console.log("✅ Connected to backend");
+        });
+        socketRef.current.on("audio_response", (segment) => {
+          playbackQueueRef.current.push(segment);
+          if (!playingRef.current) playNext();
+        });
+      }
 
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+      streamRef.current = stream;
 
-      // Setup MediaRecorder
-      mediaRecorderRef.current = new MediaRecorder(stream, { mimeType: "audio/webm" });
-      mediaRecorderRef.current.ondataavailable = (e) => {
-        if (e.data.size > 0 && wsRef.current?.readyState === 1) {
-          wsRef.current.send(e.data); // send audio chunk
+      // Stream raw 16 kHz mono PCM; the server detects speech and cuts utterances
+      const audioContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: SAMPLE_RATE });
+      audioContextRef.current = audioContext;
+      const source = audioContext.createMediaStreamSource(stream);
+      const processor = audioContext.createScriptProcessor(4096, 1, 1);
+      processor.onaudioprocess = (e) => {
+        if (socketRef.current?.connected) {
+          const pcm = floatTo16BitPCM(e.inputBuffer.getChannelData(0));
+          socketRef.current.emit("audio_chunk", { seq: chunkSeqRef.current++, pcm: pcm.buffer });
         }
       };
-      mediaRecorderRef.current.start(250); // send chunks every 250ms
+      source.connect(processor);
+      processor.connect(audioContext.destination);
+      processorRef.current = processor;
 
       // Setup analyser for live wave
-      const audioContext = new (window.AudioContext || window.webkitAudioContext)();
       const analyser = audioContext.createAnalyser();
-      const source = audioContext.createMediaStreamSource(stream);
       source.connect(analyser);
       analyser.fftSize = 256;
       analyserRef.current = analyser;
@@ -55,8 +106,11 @@ export default function MicStream() {
 
   // Stop recording
   const stopRecording = () => {
-    mediaRecorderRef.current?.stop();
-    wsRef.current?.close();
+    processorRef.current?.disconnect();
+    streamRef.current?.getTracks().forEach((track) => track.stop());
+    audioContextRef.current?.close();
+    // Let the server finish any utterance still in progress; its answer still arrives on this socket
+    socketRef.current?.emit("audio_end", { chunks: chunkSeqRef.current });
     if (animationRef.current) cancelAnimationFrame(animationRef.current);
     setIsRecording(false);
     setAmplitude(0);
@@ -65,6 +119,7 @@ export default function MicStream() {
   useEffect(() => {
     return () => {
       stopRecording(); // cleanup if component unmounts
+      socketRef.current?.disconnect();
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);